@@ -13,3 +13,11 @@ def chunks(lst, n):
     """Yield successive n-sized chunks from lst."""
     for i in range(0, len(lst), n):
         yield lst[i:i + n]
+
+
+def in_title_order(pages, titles, normalized):
+    """A mediawiki api doesn't return pages in the order that they were requested. Sort `pages` so that they are
+    in the same order as `titles`, using the api's list of normalized titles (e.g. _ replaced with space)"""
+    normalized = {n["to"]: n["from"] for n in normalized}
+    order = {title: i for i, title in enumerate(titles)}
+    return sorted(pages, key=lambda p: order.get(normalized.get(p["title"], p["title"]), len(titles)))
@@ -0,0 +1,155 @@
+"""
+Benchmarks for parts of the importer that don't need a CE or network access.
+
+    python -m ceimport.benchmark startup
+    python -m ceimport.benchmark parse-cache
+    python -m ceimport.benchmark file-pairs
+"""
+import ast
+import inspect
+import statistics
+import subprocess
+import sys
+import textwrap
+import time
+
+import click
+
+
+def time_command(args, repeat):
+    """Run a command `repeat` times and return the time taken by each run, in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def cpdl_sample_page(number, num_editions=5):
+    """Make the wikitext of a CPDL work page with `num_editions` editions, each with a pdf, midi and xml file,
+    in the format returned by get_wiki_content_for_pages"""
+    title = f"Sample work {number} (Composer {number % 50})"
+    lines = ["==Music files==", "{{Legend}}"]
+    for edition in range(num_editions):
+        name = f"Composer-Sample_work_{number}_{edition}"
+        lines.append(f"*{{{{PostedDate|2014-11-24}}}} {{{{CPDLno|{number * 10 + edition}}}}} "
+                     f"[[Media:{name}.pdf|{{{{pdf}}}}]] [[Media:{name}.mid|{{{{mid}}}}]] "
+                     f"[[Media:{name}.mxl|{{{{XML}}}}]] [[Media:{name}.musx|{{{{F14}}}}]] (Finale 2014)")
+        lines.append(f"{{{{Editor|Editor {edition}|2014-11-24}}}}{{{{Copy|CPDL}}}}")
+        lines.append(":'''Edition notes:''' Some notes about the edition, with a [[link]] and ''italics''.")
+    lines += [
+        "==General Information==",
+        f"{{{{Title|''Sample work {number}''}}}}",
+        f"{{{{Composer|Composer {number % 50}}}}}",
+        "{{Voicing|4|SATB}}",
+        "{{Genre|Sacred|Motets}}",
+        "{{Language|Latin}}",
+        "{{Instruments|A cappella}}",
+        "==Original text and translations==",
+        "{{Text|Latin}}",
+        "Ave Maria, gratia plena, Dominus tecum. " * 20,
+    ]
+    return {"title": title, "content": "\n".join(lines)}
+
+
+@click.group()
+def cli():
+    pass
+
+
+def command_imports(command):
+    """The import statements in the body of a click command. Commands import the modules that they
+    need when they run, so these are what it takes to start the command, apart from its actual work"""
+    tree = ast.parse(textwrap.dedent(inspect.getsource(command.callback)))
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = ", ".join(f"{a.name} as {a.asname}" if a.asname else a.name for a in node.names)
+            imports.append(f"import {names}")
+        elif isinstance(node, ast.ImportFrom):
+            names = ", ".join(f"{a.name} as {a.asname}" if a.asname else a.name for a in node.names)
+            imports.append(f"from {'.' * node.level}{node.module or ''} import {names}")
+    return imports
+
+
+@cli.command()
+@click.option('--repeat', default=5, help="Number of times to run each command")
+def startup(repeat):
+    """Time how long it takes to start each ceimport.cli command: importing ceimport.cli and then
+    the modules that the command imports when it runs. No CE or network access is made"""
+    from ceimport.cli import cli as ceimport_cli
+
+    baseline = time_command([sys.executable, "-c", "pass"], repeat)
+    print(f"{'python interpreter':45s} median {statistics.median(baseline) * 1000:7.1f} ms")
+    commands = [("(no command)", [])]
+    commands += [(name, command_imports(command)) for name, command in sorted(ceimport_cli.commands.items())]
+    for name, imports in commands:
+        script = "; ".join(["import ceimport.cli"] + imports)
+        times = time_command([sys.executable, "-c", script], repeat)
+        print(f"{name:45s} median {statistics.median(times) * 1000:7.1f} ms  min {min(times) * 1000:7.1f} ms")
+
+
+@cli.command('parse-cache')
+@click.option('--pages', default=5000, help="Number of pages in the category")
+@click.option('--cache-size', default=None, type=int, help="Number of parsed pages to keep (default: PARSE_CACHE_SIZE)")
+def parse_cache(pages, cache_size):
+    """Time how long it takes to parse the pages of a CPDL category for an import, with and without the parse cache.
+
+    Each page goes through the same functions as in `import_cpdl_work`: first the composers of all pages are
+    found, then the work and the files of each page are read. No network access is made.
+    """
+    from ceimport.sites import cpdl
+    from ceimport.wikitext import PARSE_CACHE_SIZE, parse_cache as cache
+
+    works = [cpdl_sample_page(i) for i in range(pages)]
+
+    def run():
+        cache.clear()
+        start = time.perf_counter()
+        cpdl.get_composers_for_works(works)
+        for work in works:
+            cpdl.composition_wikitext_to_music_composition(work)
+            cpdl.get_file_pairs_from_composition_wikitext(work)
+        return time.perf_counter() - start
+
+    cache.maxsize = 0
+    uncached = run()
+    print(f"{'no cache':25s} {uncached:7.2f} s")
+
+    for maxsize in sorted({cache_size or PARSE_CACHE_SIZE, pages}):
+        cache.maxsize = maxsize
+        cached = run()
+        name = f"cache of {maxsize} pages"
+        print(f"{name:25s} {cached:7.2f} s  ({cache.hits} hits, {cache.misses} misses, "
+              f"{uncached - cached:.2f} s saved)")
+
+
+@cli.command('file-pairs')
+@click.option('--repeat', default=5, help="Number of times to read the files of each page")
+@click.option('--editions', default="10,100,500,1000", help="Comma-separated numbers of editions on a page")
+def file_pairs(repeat, editions):
+    """Time cpdl.get_file_pairs_from_composition_wikitext on CPDL pages with many editions.
+
+    The time should grow linearly with the number of editions. Pages are parsed before the
+    timing starts, so only the time taken to find the files is measured.
+    """
+    from ceimport.sites import cpdl
+    from ceimport.wikitext import parse_wikitext
+
+    for num_editions in [int(e) for e in editions.split(",")]:
+        work = cpdl_sample_page(0, num_editions)
+        parse_wikitext(work["content"])
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pairs = cpdl.get_file_pairs_from_composition_wikitext(work)
+            times.append(time.perf_counter() - start)
+        assert len(pairs) == num_editions
+        name = f"{num_editions} editions"
+        print(f"{name:25s} median {statistics.median(times) * 1000:8.1f} ms  "
+              f"({statistics.median(times) / num_editions * 1e6:6.1f} us per edition)")
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class JsonFileCache:
+    """A dict of items which can optionally be loaded from and saved to a json file, so that it is kept
+    between runs. Subclasses read and change `_items` while holding `_lock`.
+
+    The file is written to a temporary file which then replaces it, so that an existing file
+    isn't left half written if saving fails.
+    """
+
+    def __init__(self):
+        self.path = None
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        """Use `path` to persist the cache, reading existing items from it if it exists"""
+        self.path = path
+        if os.path.exists(path):
+            with open(path) as fp:
+                items = json.load(fp)
+            with self._lock:
+                self._items = items
+
+    def save(self):
+        if self.path:
+            with self._lock:
+                data = json.dumps(self._items)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as fp:
+                fp.write(data)
+            os.replace(tmp_path, self.path)
+
+
+class IdentityCache(JsonFileCache):
+    """A mapping from the source of a node in the CE to its identifier, kept separately for each node type.
+
+    Only identifiers of nodes which are known to exist are stored. The cache can optionally be
+    loaded from and saved to a json file so that it is kept between runs.
+    The cache can be shared between threads.
+    """
+
+    def get(self, node_type, source):
+        """Returns the identifier of the `node_type` node with the given source, else None"""
+        with self._lock:
+            return self._items.get(node_type, {}).get(source)
+
+    def set(self, node_type, source, identifier):
+        if source and identifier:
+            with self._lock:
+                self._items.setdefault(node_type, {})[source] = identifier
+
+    def clear(self):
+        with self._lock:
+            self._items = {}
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(items) for items in self._items.values())
+
+
+class LRUCache(OrderedDict):
+    """A dict that holds up to `maxsize` items, removing the least recently used items when it's full.
+    Reading an item with `cache[key]` or setting it makes it the most recently used one.
+    The cache isn't thread-safe, so users that share it between threads must lock it.
+    """
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+class SingleFlight:
+    """Make sure that only one call for a key is running at a time. If a call is made with a key
+    while another call with that key is running in a different thread, it waits for the running call
+    to finish and returns its result (or raises its exception) instead of running the function again.
+
+    Calls with the same key must not be nested in a single thread.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = Future()
+                self._calls[key] = call
+
+        if not is_leader:
+            return call.result()
+
+        try:
+            result = function(*args)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+identity_cache = IdentityCache()
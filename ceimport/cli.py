@@ -1,49 +1,98 @@
 import click
 
-from ceimport import loader
-from ceimport.sites import imslp
+from ceimport.cache import identity_cache
+from ceimport.journal import DEFAULT_JOURNAL_PATH, open_journal
+from ceimport.revisions import DEFAULT_REVISION_INDEX_PATH, RevisionIndex
+
+# The loader and site modules import many slow dependencies and load the CE configuration,
+# so commands import them when they run instead of at the top of this file.
 
 
 @click.group()
-def cli():
-    pass
+@click.option('--identity-cache', 'identity_cache_file', type=click.Path(dir_okay=False),
+              help="Keep a map of source->CE identifier in this file between runs")
+@click.option('--pool-size', type=int, help="Number of connections to keep open to each site")
+@click.pass_context
+def cli(ctx, identity_cache_file, pool_size):
+    if pool_size:
+        from ceimport import session
+        session.configure(pool_maxsize=pool_size)
+    if identity_cache_file:
+        identity_cache.load(identity_cache_file)
+        ctx.call_on_close(identity_cache.save)
+
+
+def incremental_options(function):
+    function = click.option('--revision-index', 'revision_index_file', default=DEFAULT_REVISION_INDEX_PATH,
+                            show_default=True, help="File to store the revision of each imported page in")(function)
+    function = click.option('--incremental', is_flag=True,
+                            help="Only import pages that changed since they were last imported")(function)
+    return function
+
+
+def open_revision_index(incremental, revision_index_file):
+    return RevisionIndex(revision_index_file) if incremental else None
+
+
+def echo_failed(failed):
+    if failed:
+        click.echo(f"{len(failed)} items failed to import:")
+        for item in failed:
+            click.echo(f"  {item}")
 
 
 @cli.command()
 @click.argument('category')
 def cpdl_import_composers_in_category(category):
     """Find all compositions in a category that have musicxml files and import their composers"""
+    from ceimport import loader
+
     loader.import_cpdl_composers_for_category(category)
 
 
 @cli.command()
 @click.argument('category')
-def cpdl_import_works_in_category(category):
+@click.option('--resume', is_flag=True, help="Continue a previous import of this category, skipping completed works")
+@click.option('--journal', 'journal_file', default=DEFAULT_JOURNAL_PATH, show_default=True,
+              help="File to record the progress of the import in")
+@click.option('--workers', default=1, show_default=True, help="Number of works to write to the CE at the same time")
+@incremental_options
+def cpdl_import_works_in_category(category, resume, journal_file, workers, incremental, revision_index_file):
     """Find all compositions in a category that have musicxml files and import them"""
-    loader.import_cpdl_works_for_category(category)
+    from ceimport import loader
+
+    journal = open_journal(f"cpdl:{category}", journal_file, resume=resume)
+    revisions = open_revision_index(incremental, revision_index_file)
+    echo_failed(loader.import_cpdl_works_for_category(category, journal=journal, num_writers=workers,
+                                                      revisions=revisions))
 
 
 @cli.command()
 @click.argument('composer_name')
 def cpdl_import_composer(composer_name):
     """Import the given composer"""
+    from ceimport import loader
+
     loader.import_cpdl_composer(composer_name)
 
 
 @cli.command()
 @click.option('--file')
 @click.option('--url')
-def cpdl_import_work(file, url):
+@click.option('--workers', default=1, show_default=True, help="Number of works to import at the same time")
+def cpdl_import_work(file, url, workers):
     """Import the given work (--url x) or file of works (--file f).
     Works need to be wiki titles (no http://.... and no _ to split words."""
+    from ceimport import loader
+
     if url:
-        loader.import_cpdl_work([url])
+        echo_failed(loader.import_cpdl_work([url]))
     elif file:
         works = []
         with open(file, 'r') as fp:
             for work in fp:
                 works.append(work.strip())
-        loader.import_cpdl_work(works)
+        echo_failed(loader.import_cpdl_work(works, num_workers=workers))
     else:
         click.echo("Need to provide --url or --file")
 
@@ -51,6 +100,8 @@ def cpdl_import_work(file, url):
 @cli.command()
 @click.argument('mbid')
 def musicbrainz_import_artist(mbid):
+    from ceimport import loader
+
     persons = loader.load_artist_from_musicbrainz(mbid)
     loader.create_persons_and_link(persons)
 
@@ -58,22 +109,25 @@ def musicbrainz_import_artist(mbid):
 @cli.command()
 @click.argument('mbid')
 def musicbrainz_import_work(mbid):
+    from ceimport import loader
+
     loader.load_musiccomposition_from_musicbrainz(mbid)
 
 
 @cli.command()
 @click.option('--file')
 @click.option('--url')
-def imslp_import_artist(file, url):
+@click.option('--workers', default=1, show_default=True, help="Number of artists to import at the same time")
+def imslp_import_artist(file, url, workers):
     """Import an artist category (--url x) or file of artists (--file f)"""
+    from ceimport import loader, workers as ceworkers
+
     if url:
-        persons = loader.load_artist_from_imslp(url)
-        loader.create_persons_and_link(persons)
+        loader.import_imslp_artist(url)
     elif file:
         with open(file, 'r') as fp:
-            for artist in fp:
-                persons = loader.load_artist_from_imslp(artist.strip())
-                loader.create_persons_and_link(persons)
+            artists = [artist.strip() for artist in fp]
+        echo_failed(ceworkers.run_pool(loader.import_imslp_artist, artists, workers))
     else:
         click.echo("Need to provide --url or --file")
 
@@ -81,15 +135,17 @@ def imslp_import_artist(file, url):
 @cli.command()
 @click.option('--file')
 @click.option('--url')
-def imslp_import_work(file, url):
+@click.option('--workers', default=1, show_default=True, help="Number of works to import at the same time")
+def imslp_import_work(file, url, workers):
     """Import either a work title (--url) or all titles in a file (--file)"""
+    from ceimport import loader, workers as ceworkers
+
     if url:
         loader.load_musiccomposition_from_imslp_name(url)
     elif file:
         with open(file, 'r') as fp:
             works = fp.read().splitlines()
-            for work in works:
-                loader.load_musiccomposition_from_imslp_name(work)
+        echo_failed(ceworkers.run_pool(loader.load_musiccomposition_from_imslp_name, works, workers))
     else:
         click.echo("Need to provide --url or --file")
 
@@ -98,23 +154,58 @@ def imslp_import_work(file, url):
 @click.argument('reverselookup')
 def imslp_import_single_file(reverselookup):
     """Import a specific file, its work, and composition"""
+    from ceimport import loader
 
     loader.load_musiccomposition_from_imslp_by_file(reverselookup)
 
 
 @cli.command()
 @click.argument('category')
-def imslp_import_works_in_category(category):
+@click.option('--resume', is_flag=True, help="Continue a previous import of this category, skipping completed works")
+@click.option('--journal', 'journal_file', default=DEFAULT_JOURNAL_PATH, show_default=True,
+              help="File to record the progress of the import in")
+@click.option('--dump', 'dump_file', type=click.Path(exists=True, dir_okay=False),
+              help="Read the composer of each work from this dump of all IMSLP pages (see imslp-dump-all-pages)")
+@incremental_options
+def imslp_import_works_in_category(category, resume, journal_file, dump_file, incremental, revision_index_file):
     """Import all works in a category if they have musicxml files"""
-    pages = imslp.category_pagelist(category)
-    for p in pages:
-        loader.load_musiccomposition_from_imslp_name(p)
+    from ceimport import loader
+
+    journal = open_journal(f"imslp:{category}", journal_file, resume=resume)
+    revisions = open_revision_index(incremental, revision_index_file)
+    loader.import_imslp_works_for_category(category, journal=journal, dump_path=dump_file, revisions=revisions)
+
+
+@cli.command()
+@click.argument('dump_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--composer', help="Only import works by this composer (e.g. Category:Bach, Johann Sebastian)")
+@click.option('--resume', is_flag=True, help="Continue a previous import of this dump, skipping completed works")
+@click.option('--journal', 'journal_file', default=DEFAULT_JOURNAL_PATH, show_default=True,
+              help="File to record the progress of the import in")
+def imslp_import_works_in_dump(dump_file, composer, resume, journal_file):
+    """Import all works in a dump of IMSLP pages if they have musicxml files"""
+    from ceimport import loader
+
+    journal = open_journal(f"imslp-dump:{composer or 'all'}", journal_file, resume=resume)
+    loader.import_imslp_works_from_dump(dump_file, composer=composer, journal=journal)
+
+
+@cli.command()
+@click.argument('output', default="all-imslp-pages.json")
+def imslp_dump_all_pages(output):
+    """Write a list of all work pages in IMSLP and their composers to OUTPUT.
+    If OUTPUT ends in .ndjson or .jsonl, write one page per line"""
+    from ceimport.sites import imslp
+
+    imslp.api_all_pages(output)
 
 
 @cli.command()
 @click.argument('category_name')
 def imslp_pages_in_category(category_name):
     """Print all work pages in a category (e.g. For unaccompanied chorus)"""
+    from ceimport.sites import imslp
+
     pages = imslp.category_pagelist(category_name)
     for p in pages:
         print(p)
@@ -122,10 +213,13 @@ def imslp_pages_in_category(category_name):
 
 @cli.command()
 @click.argument('pages', type=click.File('r'))
-def imslp_filter_xml(pages):
+@click.option('--workers', default=2, show_default=True, help="Number of chunks of 50 pages to load at the same time")
+def imslp_filter_xml(pages, workers):
     """Given a file containing work pages, filter only the ones that have musicxml files"""
+    from ceimport.sites import imslp
+
     works = pages.read().splitlines()
-    for xml_work in imslp.filter_works_for_xml(works):
+    for xml_work in imslp.iter_works_for_xml(works, workers=workers):
         print(xml_work)
 
 
@@ -1,8 +1,70 @@
+import re
+import threading
+
 import trompace.connection
 from trompace.config import config
+from trompace.exceptions import QueryException
+from trompace.mutations import MUTATION
+
+from ceimport import chunks
+
+# Maximum number of mutations that are sent to the CE in a single request
+MUTATION_BATCH_SIZE = 50
+
+MUTATION_WRAPPER = re.compile(r'^\s*mutation\s*{(.*)}\s*$', re.DOTALL)
 
-config.load()
+_config_loaded = False
+_config_lock = threading.Lock()
+
+
+def load_config():
+    """Load the CE client configuration the first time that it is needed"""
+    global _config_loaded
+    with _config_lock:
+        if not _config_loaded:
+            config.load()
+            _config_loaded = True
 
 
 def submit_request(query):
+    load_config()
     return trompace.connection.submit_query(query, auth_required=True)
+
+
+def alias_mutation(alias, mutation):
+    """Take a complete mutation document (as generated by the trompace.mutations functions)
+    and return the body of the mutation prefixed by `alias`, so that it can be
+    included in a document with other mutations"""
+    match = MUTATION_WRAPPER.match(mutation)
+    if not match:
+        raise ValueError("Expected a single `mutation { ... }` document")
+    return f"{alias}: {match.group(1).strip()}"
+
+
+def submit_mutations(mutations, batch_size=MUTATION_BATCH_SIZE):
+    """Submit many mutations to the CE, packing up to `batch_size` of them into each request.
+
+    Each mutation is given an alias in the combined document, and the results are mapped back
+    from these aliases.
+
+    Arguments:
+        mutations: a list of mutation documents, as generated by the trompace.mutations functions
+        batch_size: the maximum number of mutations to send in a single request
+
+    Returns:
+        a list of the result of each mutation, in the same order as `mutations`
+
+    Raises:
+        QueryException: if the CE returns errors for a batch
+    """
+    results = []
+    for batch in chunks(mutations, batch_size):
+        aliases = [f"m{i}" for i in range(len(batch))]
+        body = "\n".join(alias_mutation(alias, m) for alias, m in zip(aliases, batch))
+        resp = submit_request(MUTATION.format(mutation=body))
+        # A failed mutation in a batch gives an error instead of a result. Don't drop the batch silently
+        if resp.get('errors'):
+            raise QueryException(resp['errors'])
+        data = resp.get('data') or {}
+        results.extend(data.get(alias) for alias in aliases)
+    return results
@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+
+DEFAULT_JOURNAL_PATH = "import-journal.sqlite"
+
+# The steps that an import of a single title goes through, in order
+FETCHED = "fetched"
+PARSED = "parsed"
+PERSONS = "persons"
+COMPOSITION = "composition"
+LINKS = "links"
+# A title which doesn't need to be imported (e.g. it has no musicxml file)
+SKIPPED = "skipped"
+
+STEPS = [FETCHED, PARSED, PERSONS, COMPOSITION, LINKS]
+
+
+class ImportJournal:
+    """A record of how far each title in an import got, stored in an sqlite database so that an
+    import which stopped part way through can be resumed.
+
+    An import is identified by a name (e.g. cpdl:4-part choral music), and a single database
+    can hold the journals of many imports.
+
+    When an import is resumed, only titles that are complete (LINKS or SKIPPED) are left out.
+    The other steps are recorded to show how far a title got, but a title that was partly
+    imported is imported again from the start. This is safe because existing nodes in the CE
+    are looked up before they are created.
+    """
+
+    def __init__(self, name, path=DEFAULT_JOURNAL_PATH):
+        self.name = name
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS journal (
+                name TEXT NOT NULL,
+                title TEXT NOT NULL,
+                step TEXT NOT NULL,
+                PRIMARY KEY (name, title, step))""")
+
+    def reset(self):
+        """Remove all progress of this import, so that it starts from the beginning"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM journal WHERE name = ?", (self.name,))
+
+    def mark(self, title, step):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO journal (name, title, step) VALUES (?, ?, ?)",
+                             (self.name, title, step))
+
+    def steps_done(self, title):
+        with self._lock:
+            rows = self._db.execute("SELECT step FROM journal WHERE name = ? AND title = ?",
+                                    (self.name, title)).fetchall()
+        return {step for (step,) in rows}
+
+    def is_done(self, title, step):
+        return step in self.steps_done(title)
+
+    def is_complete(self, title):
+        """True if the title was completely imported, or there was nothing to import"""
+        steps = self.steps_done(title)
+        return LINKS in steps or SKIPPED in steps
+
+    def completed_titles(self):
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT title FROM journal WHERE name = ? AND step IN (?, ?)",
+                                    (self.name, LINKS, SKIPPED)).fetchall()
+        return {title for (title,) in rows}
+
+    def close(self):
+        self._db.close()
+
+
+def open_journal(name, path=DEFAULT_JOURNAL_PATH, resume=False):
+    """Open the journal for the import `name`. Unless `resume` is set, any previous progress is removed"""
+    journal = ImportJournal(name, path)
+    if not resume:
+        journal.reset()
+    return journal
+
+
+def mark(journal, title, step):
+    """Mark a step as done if there is a journal for this import"""
+    if journal is not None:
+        journal.mark(title, step)
@@ -1,4 +1,5 @@
 import itertools
+import re
 
 from trompace.mutations import person as mutation_person
 from trompace.mutations import place as mutation_place
@@ -7,8 +8,11 @@ from trompace.mutations import mediaobject as mutation_mediaobject
 from trompace.queries import person as query_person
 from trompace.queries import musiccomposition as query_musiccomposition
 from trompace.queries import mediaobject as query_mediaobject
+from trompace.queries.templates import format_filter_query
 
-from ceimport import connection, logger
+from ceimport import chunks, connection, journal as import_journal, logger, revisions as revision_index, workers
+from ceimport.cache import identity_cache, SingleFlight
+from ceimport.pipeline import Pipeline, Stage
 from ceimport.sites import musicbrainz, cpdl
 from ceimport.sites import viaf
 from ceimport.sites import imslp
@@ -20,70 +24,88 @@ from ceimport.sites import isni
 
 CREATOR_URL = "https://github.com/trompamusic/ce-data-import/tree/master"
 
+# Number of sources to look up in a single query when prefetching existing nodes
+PREFETCH_PAGE_SIZE = 200
 
-def load_artist_from_musicbrainz(artist_mbid):
-    logger.info("Importing musicbrainz artist %s", artist_mbid)
+# Lookups and creations of nodes that are in progress, keyed by (type, source), so that imports
+# running in more than one thread wait for each other instead of creating the same node twice
+_in_flight = SingleFlight()
+
+
+def _dedup_persons(results):
+    """Flatten the results of fetching persons from a number of sites and
+    remove those that have no source or a duplicate source, keeping the first one"""
     persons = []
-    mb_person = musicbrainz.load_person_from_musicbrainz(artist_mbid)
-    persons.append(mb_person)
+    for r in results:
+        if isinstance(r, list):
+            persons.extend(r)
+        elif r:
+            persons.append(r)
+
+    ret = []
+    seen = set()
+    for p in persons:
+        if 'source' in p:
+            if p['source'] not in seen:
+                ret.append(p)
+                seen.add(p['source'])
+    return ret
 
+
+def load_artist_from_musicbrainz(artist_mbid):
+    logger.info("Importing musicbrainz artist %s", artist_mbid)
     rels = musicbrainz.load_person_relations_from_musicbrainz(artist_mbid)
+
+    # Once we know the relations, each site can be loaded independently
+    tasks = [("musicbrainz.org", musicbrainz.load_person_from_musicbrainz, [artist_mbid])]
     if 'viaf' in rels:
-        viaf_person = viaf.load_person_from_viaf(rels['viaf'])
-        persons.append(viaf_person)
+        tasks.append(("viaf.org", viaf.load_person_from_viaf, [rels['viaf']]))
     if 'imslp' in rels:
         # TODO: If there are more rels in imslp that aren't in MB we could use them here
         imslp_url = rels['imslp']
-        imslp_person = imslp.api_composer(imslp_url.replace("https://imslp.org/wiki/", "").replace("_", " "))
-        persons.append(imslp_person)
+        imslp_name = imslp_url.replace("https://imslp.org/wiki/", "").replace("_", " ")
+        tasks.append(("imslp.org", imslp.api_composer, [imslp_name]))
     if 'worldcat' in rels:
-        worldcat_person = worldcat.load_person_from_worldcat(rels['worldcat'])
-        persons.append(worldcat_person)
+        tasks.append(("worldcat.org", worldcat.load_person_from_worldcat, [rels['worldcat']]))
     if 'loc' in rels:
-        loc_person = loc.load_person_from_loc(rels['loc'])
-        persons.append(loc_person)
+        tasks.append(("id.loc.gov", loc.load_person_from_loc, [rels['loc']]))
     if 'isni' in rels:
         isni_url = f"https://isni.org/isni/{rels['isni']}"
-        isni_person = isni.load_person_from_isni(isni_url)
-        persons.append(isni_person)
+        tasks.append(("isni.org", isni.load_person_from_isni, [isni_url]))
     if 'wikidata' in rels:
-        wd_person = wikidata.load_person_from_wikidata_url(rels['wikidata'])
-        if wd_person:
-            persons.append(wd_person)
-        wp_person = wikidata.load_person_from_wikipedia_wikidata_url(rels['wikidata'], 'en')
-        if wp_person:
-            persons.append(wp_person)
-
-    # dedup by source
-    ret = []
-    seen = set()
-    for p in persons:
-        if 'source' in p:
-            if p['source'] not in seen:
-                ret.append(p)
-                seen.add(p['source'])
-    return ret
+        tasks.append(("wikidata.org", wikidata.load_person_from_wikidata_url, [rels['wikidata']]))
+        tasks.append(("wikipedia.org", wikidata.load_person_from_wikipedia_wikidata_url, [rels['wikidata'], 'en']))
+
+    return _dedup_persons(workers.run_concurrently(tasks))
 
 
 def get_existing_person_by_source(source) -> str:
     """Returns an identifier of the thing with the given source, else None"""
+    cached = identity_cache.get("Person", source)
+    if cached:
+        return cached
     query_by_source = query_person.query_person(source=source)
     resp = connection.submit_request(query_by_source)
     person = resp.get('data', {}).get('Person', [])
     if not person:
         return None
     else:
+        identity_cache.set("Person", source, person[0]['identifier'])
         return person[0]['identifier']
 
 
 def get_existing_mediaobject_by_source(source) -> str:
     """Returns an identifier of the thing with the given source, else None"""
+    cached = identity_cache.get("MediaObject", source)
+    if cached:
+        return cached
     query_by_source = query_mediaobject.query_mediaobject(source=source)
     resp = connection.submit_request(query_by_source)
     mediaobject = resp.get('data', {}).get('MediaObject', [])
     if not mediaobject:
         return None
     else:
+        identity_cache.set("MediaObject", source, mediaobject[0]['identifier'])
         return mediaobject[0]['identifier']
 
 
@@ -92,7 +114,8 @@ def create_mediaobject(mediaobject):
     mutation_create = mutation_mediaobject.mutation_create_media_object(**mediaobject)
     resp = connection.submit_request(mutation_create)
     # TODO: If this query fails?
-    return resp['data']['CreateMediaObject']['identifier']
+    mediaobject_id = resp['data']['CreateMediaObject']['identifier']
+    return mediaobject_id
 
 
 def create_person(person):
@@ -151,33 +174,34 @@ def create_musiccomposition(musiccomposition):
     mutation_create = mutation_musiccomposition.mutation_create_music_composition(**musiccomposition)
     resp = connection.submit_request(mutation_create)
     # TODO: If this query fails?
-    return resp['data']['CreateMusicComposition']['identifier']
+    musiccomposition_id = resp['data']['CreateMusicComposition']['identifier']
+    return musiccomposition_id
 
 
 def link_musiccomposition_and_parts(musiccomposition_id, part_ids):
+    queries = []
     for part_id in part_ids:
-        query = mutation_musiccomposition.mutation_merge_music_composition_included_composition(musiccomposition_id, part_id)
-        connection.submit_request(query)
-        query = mutation_musiccomposition.mutation_merge_music_composition_has_part(musiccomposition_id, part_id)
-        connection.submit_request(query)
+        queries.append(mutation_musiccomposition.mutation_merge_music_composition_included_composition(musiccomposition_id, part_id))
+        queries.append(mutation_musiccomposition.mutation_merge_music_composition_has_part(musiccomposition_id, part_id))
+    connection.submit_mutations(queries)
 
 
 def link_musiccomposition_and_composers(musiccomposition_id, composer_ids):
-    for composer_id in composer_ids:
-        query = mutation_musiccomposition.mutation_merge_music_composition_composer(musiccomposition_id, composer_id)
-        connection.submit_request(query)
+    queries = [mutation_musiccomposition.mutation_merge_music_composition_composer(musiccomposition_id, composer_id)
+               for composer_id in composer_ids]
+    connection.submit_mutations(queries)
 
 
 def link_musiccomposition_exactmatch(musiccomposition_ids):
-    for from_id, to_id in itertools.permutations(musiccomposition_ids, 2):
-        query = mutation_musiccomposition.mutation_merge_music_composition_exact_match(from_id, to_id)
-        connection.submit_request(query)
+    queries = [mutation_musiccomposition.mutation_merge_music_composition_exact_match(from_id, to_id)
+               for from_id, to_id in itertools.permutations(musiccomposition_ids, 2)]
+    connection.submit_mutations(queries)
 
 
 def link_person_ids(person_ids):
-    for from_id, to_id in itertools.permutations(person_ids, 2):
-        query = mutation_person.mutation_person_add_exact_match_person(from_id, to_id)
-        connection.submit_request(query)
+    queries = [mutation_person.mutation_person_add_exact_match_person(from_id, to_id)
+               for from_id, to_id in itertools.permutations(person_ids, 2)]
+    connection.submit_mutations(queries)
 
 
 def link_musiccomposition_and_mediaobject(composition_id, mediaobject_id):
@@ -205,38 +229,89 @@ def create_persons_and_link(persons):
 
 def get_existing_musiccomposition_by_source(source) -> str:
     """Returns an identifier of the thing with the given source, else None"""
+    cached = identity_cache.get("MusicComposition", source)
+    if cached:
+        return cached
     query_by_source = query_musiccomposition.query_musiccomposition(source=source)
     resp = connection.submit_request(query_by_source)
     mc = resp.get('data', {}).get('MusicComposition', [])
     if not mc:
         return None
     else:
+        identity_cache.set("MusicComposition", source, mc[0]['identifier'])
         return mc[0]['identifier']
 
 
-def get_or_create_person(person):
-    existing = get_existing_person_by_source(person['source'])
+def prefetch_existing_by_source(node_type, sources, page_size=PREFETCH_PAGE_SIZE):
+    """Look up all nodes of type `node_type` which have one of the given sources using `source_in`
+    queries of `page_size` items, and add their identifiers to the identity cache.
+    Sources which are already in the cache are not queried again.
+
+    Returns:
+        a dictionary of source: identifier for the sources that exist in the CE
+    """
+    to_query = [s for s in dict.fromkeys(sources) if s and not identity_cache.get(node_type, s)]
+    for page in chunks(to_query, page_size):
+        query = format_filter_query(node_type, {"source_in": page}, ["identifier", "source"])
+        resp = connection.submit_request(query)
+        for item in resp.get('data', {}).get(node_type, []):
+            if not identity_cache.get(node_type, item['source']):
+                identity_cache.set(node_type, item['source'], item['identifier'])
+
+    existing = {}
+    for source in sources:
+        identifier = identity_cache.get(node_type, source)
+        if identifier:
+            existing[source] = identifier
+    return existing
+
+
+# The identity cache is filled by the get_or_create_* functions, which know the source that a node
+# is looked up by (e.g. the permalink of an IMSLP file, instead of the work page in its `source`)
+def _get_or_create_person(person):
+    source = person['source']
+    existing = get_existing_person_by_source(source)
     if existing:
         return existing
-    return create_person(person)
 
+    person_id = create_person(person)
+    identity_cache.set("Person", source, person_id)
+    return person_id
 
-def get_or_create_musiccomposition(musiccomposition):
+
+def get_or_create_person(person):
+    return _in_flight.do(("Person", person['source']), _get_or_create_person, person)
+
+
+def _get_or_create_musiccomposition(musiccomposition):
     source = musiccomposition['source']
     existing = get_existing_musiccomposition_by_source(source)
     if existing:
         return existing
 
-    return create_musiccomposition(musiccomposition)
+    musiccomposition_id = create_musiccomposition(musiccomposition)
+    identity_cache.set("MusicComposition", source, musiccomposition_id)
+    return musiccomposition_id
 
 
-def get_or_create_mediaobject(mediaobject):
+def get_or_create_musiccomposition(musiccomposition):
+    return _in_flight.do(("MusicComposition", musiccomposition['source']),
+                         _get_or_create_musiccomposition, musiccomposition)
+
+
+def _get_or_create_mediaobject(mediaobject):
     source = mediaobject['source']
     existing = get_existing_mediaobject_by_source(source)
     if existing:
         return existing
 
-    return create_mediaobject(mediaobject)
+    mediaobject_id = create_mediaobject(mediaobject)
+    identity_cache.set("MediaObject", source, mediaobject_id)
+    return mediaobject_id
+
+
+def get_or_create_mediaobject(mediaobject):
+    return _in_flight.do(("MediaObject", mediaobject['source']), _get_or_create_mediaobject, mediaobject)
 
 
 def load_musiccomposition_from_musicbrainz(work_mbid):
@@ -260,16 +335,57 @@ def load_musiccomposition_from_musicbrainz(work_mbid):
         all_part_ids.append(part_id)
 
     link_musiccomposition_and_parts(musiccomp_ceid, all_part_ids)
-    link_musiccomposition_and_composers(musiccomp_ceid, composer_ids)
-    # Link composer to all parts
-    for part_id in all_part_ids:
-        link_musiccomposition_and_composers(part_id, composer_ids)
+    # Link composer to the work and to all parts in a single batch
+    queries = [mutation_musiccomposition.mutation_merge_music_composition_composer(work_id, composer_id)
+               for work_id in [musiccomp_ceid] + all_part_ids
+               for composer_id in composer_ids]
+    connection.submit_mutations(queries)
 
     return {"musiccomposition_id": musiccomp_ceid,
             "part_ids": all_part_ids,
             "person_ids": composer_ids}
 
 
+def prefetch_imslp_works(work_names, dump=None):
+    """Fill the identity cache with all works in `work_names` and their composers that already exist in the CE.
+
+    If `dump` (the result of `imslp.load_all_pages_dump`) is set, composers are taken from it"""
+    work_sources = []
+    composer_sources = []
+    for work_name in work_names:
+        work_sources.append("https://imslp.org/wiki/" + work_name.replace(" ", "_"))
+        dump_page = (dump or {}).get(work_name.replace("_", " "))
+        if dump_page and dump_page.get("parent"):
+            composer_sources.append(f'https://imslp.org/wiki/{dump_page["parent"].replace(" ", "_")}')
+            continue
+        # IMSLP work pages are named "Title (Surname, Name)", and the composer's page is "Category:Surname, Name"
+        composer_match = re.search(r"\(([^()]+)\)$", work_name.replace("_", " "))
+        if composer_match:
+            composer = "Category:" + composer_match.group(1)
+            composer_sources.append(f'https://imslp.org/wiki/{composer.replace(" ", "_")}')
+    prefetch_existing_by_source("MusicComposition", work_sources)
+    prefetch_existing_by_source("Person", composer_sources)
+
+
+def _load_persons_from_wikipedia_url(wikipedia_url):
+    """Load the wikidata and wikipedia persons for the wikidata item of a wikipedia page"""
+    wikidata_id = wikidata.get_wikidata_id_from_wikipedia_url(wikipedia_url)
+    if not wikidata_id:
+        return []
+    wikidata_url = f"https://www.wikidata.org/wiki/{wikidata_id}"
+    return [wikidata.load_person_from_wikidata_url(wikidata_url),
+            wikidata.load_person_from_wikipedia_wikidata_url(wikidata_url, 'en')]
+
+
+def _load_person_from_musicbrainz_by_imslp_url(url):
+    artist_mbid = musicbrainz.get_artist_mbid_by_imslp_url(url)
+    # TODO: If the artist exists in MB, then we should also import all of the other
+    #  relationships that exist, by using `load_artist_from_musicbrainz`
+    if artist_mbid:
+        return musicbrainz.load_person_from_musicbrainz(artist_mbid)
+    return None
+
+
 def load_artist_from_imslp(url):
     logger.info("Importing imslp artist %s", url)
     if "Category:" not in url:
@@ -278,56 +394,33 @@ def load_artist_from_imslp(url):
     if url.startswith("https://imslp.org"):
         url = "/".join(url.split("/")[4:])
 
-    people = []
-
-    imslp_person = imslp.api_composer(url)
-    if imslp_person:
-        people.append(imslp_person)
-
     rels = imslp.api_composer_get_relations(url)
+
+    tasks = [("imslp.org", imslp.api_composer, [url])]
     if 'worldcat' in rels:
-        worldcat_person = worldcat.load_person_from_worldcat(rels['worldcat'])
-        people.append(worldcat_person)
+        tasks.append(("worldcat.org", worldcat.load_person_from_worldcat, [rels['worldcat']]))
     if 'viaf' in rels:
-        viaf_person = viaf.load_person_from_viaf(rels['viaf'])
-        people.append(viaf_person)
+        tasks.append(("viaf.org", viaf.load_person_from_viaf, [rels['viaf']]))
     if 'wikipedia' in rels:
-        wikidata_id = wikidata.get_wikidata_id_from_wikipedia_url(rels['wikipedia'])
-        if wikidata_id:
-            wd_person = wikidata.load_person_from_wikidata_url(rels['wikidata'])
-            if wd_person:
-                people.append(wd_person)
-            wp_person = wikidata.load_person_from_wikipedia_wikidata_url(rels['wikidata'], 'en')
-            if wp_person:
-                people.append(wp_person)
+        tasks.append(("wikipedia.org", _load_persons_from_wikipedia_url, [rels['wikipedia']]))
     if 'musicbrainz' in rels:
-        mb_person = musicbrainz.load_person_from_musicbrainz(rels['musicbrainz'])
-        people.append(mb_person)
+        tasks.append(("musicbrainz.org", musicbrainz.load_person_from_musicbrainz, [rels['musicbrainz']]))
     if 'isni' in rels:
-        isni_person = isni.load_person_from_isni(rels['isni'])
-        people.append(isni_person)
+        tasks.append(("isni.org", isni.load_person_from_isni, [rels['isni']]))
     if 'loc' in rels:
-        loc_person = loc.load_person_from_loc(rels['loc'])
-        people.append(loc_person)
+        tasks.append(("id.loc.gov", loc.load_person_from_loc, [rels['loc']]))
 
     # If no link to musicbrainz from imslp, do a reverse lookup in musicbrainz to see if it's there
     if 'musicbrainz' not in rels:
-        artist_mbid = musicbrainz.get_artist_mbid_by_imslp_url(url)
-        # TODO: If the artist exists in MB, then we should also import all of the other
-        #  relationships that exist, by using `load_artist_from_musicbrainz`
-        if artist_mbid:
-            mb_person = musicbrainz.load_person_from_musicbrainz(artist_mbid)
-            people.append(mb_person)
-
-    # dedup by source
-    ret = []
-    seen = set()
-    for p in people:
-        if 'source' in p:
-            if p['source'] not in seen:
-                ret.append(p)
-                seen.add(p['source'])
-    return ret
+        tasks.append(("musicbrainz.org", _load_person_from_musicbrainz_by_imslp_url, [url]))
+
+    return _dedup_persons(workers.run_concurrently(tasks))
+
+
+def import_imslp_artist(url):
+    """Load an artist from IMSLP and its related sites, and create all of them in the CE"""
+    persons = load_artist_from_imslp(url)
+    return create_persons_and_link(persons)
 
 
 def load_musiccomposition_from_imslp_by_file(reverselookup):
@@ -343,17 +436,18 @@ def load_musiccomposition_from_imslp_by_file(reverselookup):
     # The composition url will end with a #anchor, remove it
     if "#" in composition:
         composition = composition[:composition.index("#")]
-    load_musiccomposition_from_imslp_name(composition, load_files=False)
+    page = imslp.WorkPage(composition)
+    load_musiccomposition_from_imslp_name(composition, load_files=False, page=page)
 
     # Once we loaded the composition, we look it up again to get the id
     url = "https://imslp.org/wiki/" + composition.replace(" ", "_")
     composition_id = get_existing_musiccomposition_by_source(url)
     print("got id", composition_id)
 
-    wikitext = imslp.get_wiki_content_for_pages([composition])
     if composition_id:
-        if wikitext:
-            file = imslp.get_mediaobject_for_filename(wikitext[0], filename.replace(" ", "_"))
+        if page.wikitext:
+            file = imslp.get_mediaobject_for_filename(page.wikitext, filename.replace(" ", "_"), parsed=page.parsed,
+                                                      page=page)
             if file:
                 mediaobject_ceid = get_or_create_imslp_mediaobject(file)
                 link_musiccomposition_and_mediaobject(composition_id=composition_id,
@@ -362,38 +456,70 @@ def load_musiccomposition_from_imslp_by_file(reverselookup):
         logger.info(" - cannot find composition after importing it once")
 
 
-def get_or_create_imslp_mediaobject(mediaobject):
-    """Look for an existing mediaobject based on the url field (permalink)
-    otherwise create one"""
+def _get_or_create_imslp_mediaobject(mediaobject):
     source = mediaobject['url']
     existing = get_existing_mediaobject_by_source(source)
     if existing:
         return existing
 
-    return create_mediaobject(mediaobject)
+    mediaobject_id = create_mediaobject(mediaobject)
+    identity_cache.set("MediaObject", source, mediaobject_id)
+    return mediaobject_id
+
+
+def get_or_create_imslp_mediaobject(mediaobject):
+    """Look for an existing mediaobject based on the url field (permalink)
+    otherwise create one"""
+    return _in_flight.do(("MediaObject", mediaobject['url']), _get_or_create_imslp_mediaobject, mediaobject)
+
+
+def _get_or_import_imslp_composer(composer):
+    composer_source = f'https://imslp.org/wiki/{composer.replace(" ", "_")}'
+    existing_composer_ceid = get_existing_person_by_source(composer_source)
+    if not existing_composer_ceid:
+        persons = load_artist_from_imslp(composer)
+        create_persons_and_link(persons)
+        existing_composer_ceid = get_existing_person_by_source(composer_source)
+    return existing_composer_ceid
+
+
+def get_or_import_imslp_composer(composer):
+    """Get the CE identifier of an IMSLP composer (a Category: page name),
+    importing the composer and their related sites if they don't exist yet"""
+    composer_source = f'https://imslp.org/wiki/{composer.replace(" ", "_")}'
+    # A different key to get_or_create_person, which is called for the same source during the import
+    return _in_flight.do(("ImportPerson", composer_source), _get_or_import_imslp_composer, composer)
 
 
-def load_musiccomposition_from_imslp_name(imslp_name, load_files=True):
+def load_musiccomposition_from_imslp_name(imslp_name, load_files=True, journal=None, dump=None, page=None):
     """Load a MusicComposition from a single page on IMSLP,
     and also load any musicxml files as MediaObjects and any related PDFs
+
+    If `journal` is set, record the progress of the import of this page in it.
+    If `dump` (the result of `imslp.load_all_pages_dump`) is set and contains this page, the
+    composer of the work is read from it instead of the IMSLP API.
+    If `page` (an imslp.WorkPage of this work) is set, the resources that it already loaded are used
+
+    Returns:
+        True if the work was written to the CE, False if it was skipped
     """
 
     logger.info("Importing imslp work %s", imslp_name)
-    work = imslp.api_work(imslp_name)
+    if page is None:
+        page = imslp.WorkPage(imslp_name, dump_page=(dump or {}).get(imslp_name.replace("_", " ")))
+    work = imslp.api_work(imslp_name, page=page)
+    import_journal.mark(journal, imslp_name, import_journal.FETCHED)
+    import_journal.mark(journal, imslp_name, import_journal.PARSED)
     musiccomposition = work["work"]
     composer = work["composer"]
     musicbrainz_work_id = work["musicbrainz_work_id"]
 
     if composer:
         composition_id = get_or_create_musiccomposition(musiccomposition)
+        import_journal.mark(journal, imslp_name, import_journal.COMPOSITION)
 
-        composer_source = f'https://imslp.org/wiki/{composer.replace(" ", "_")}'
-
-        existing_composer_ceid = get_existing_person_by_source(composer_source)
-        if not existing_composer_ceid:
-            persons = load_artist_from_imslp(composer)
-            create_persons_and_link(persons)
-            existing_composer_ceid = get_existing_person_by_source(composer_source)
+        existing_composer_ceid = get_or_import_imslp_composer(composer)
+        import_journal.mark(journal, imslp_name, import_journal.PERSONS)
 
         link_musiccomposition_and_composers(composition_id, [existing_composer_ceid])
 
@@ -403,10 +529,10 @@ def load_musiccomposition_from_imslp_name(imslp_name, load_files=True):
             link_musiccomposition_exactmatch([composition_id, mb_work_ceid])
 
         if not load_files:
-            return
+            import_journal.mark(journal, imslp_name, import_journal.LINKS)
+            return True
 
-        wikitext = imslp.get_wiki_content_for_pages([imslp_name])
-        files = imslp.files_for_work(wikitext[0])
+        files = imslp.files_for_work(page.wikitext, parsed=page.parsed, page=page)
         # We expect to see just one xml file, and maybe one pdf
         # TODO, there could be more than one, we need to support this too
         if len(files) == 0:
@@ -442,8 +568,12 @@ def load_musiccomposition_from_imslp_name(imslp_name, load_files=True):
                     # TODO: We should check if this is the case all the time.
                     link_mediaobject_was_derived_from(source_id=xmlmediaobject_ceid,
                                                       derived_id=pdfmediaobject_ceid)
+        import_journal.mark(journal, imslp_name, import_journal.LINKS)
+        return True
     else:
         logger.info(" - No composer??, skipping")
+        import_journal.mark(journal, imslp_name, import_journal.SKIPPED)
+        return False
 
 
 def import_cpdl_composer_wikitext(composer_wikitext):
@@ -497,19 +627,48 @@ def import_cpdl_composers_for_category(cpdl_category):
         import_cpdl_composer_wikitext(composer)
 
 
-def import_cpdl_work_wikitext(work_wikitext):
+def _get_or_import_cpdl_composer(composer):
+    source = f'https://cpdl.org/wiki/index.php/{composer.replace(" ", "_")}'
+    existing_composer_ceid = get_existing_person_by_source(source)
+    if not existing_composer_ceid:
+        existing_composer_ceid = import_cpdl_composer(composer)
+    return existing_composer_ceid
+
+
+def get_or_import_cpdl_composer(composer):
+    """Get the CE identifier of a CPDL composer, importing the composer and their
+    related sites if they don't exist yet"""
+    source = f'https://cpdl.org/wiki/index.php/{composer.replace(" ", "_")}'
+    return _in_flight.do(("ImportPerson", source), _get_or_import_cpdl_composer, composer)
+
+
+def build_cpdl_work(work_wikitext):
+    """Parse a CPDL work page and load the details of its files, without writing anything to the CE"""
     composition = cpdl.composition_wikitext_to_music_composition(work_wikitext)
-    composer = composition['composer']
+    mediaobjects = []
+    if composition['composer'] is not None:
+        mediaobjects = cpdl.composition_wikitext_to_mediaobjects(work_wikitext)
+    return {"title": work_wikitext['title'],
+            "work": composition['work'],
+            "composer": composition['composer'],
+            "mediaobjects": mediaobjects}
+
+
+def write_cpdl_work(cpdl_work, journal=None):
+    """Write a work loaded with `build_cpdl_work` to the CE, importing its composer if needed.
+    If `journal` is set, record the progress of the import of this work in it. Works with no
+    composer are recorded as skipped.
+    Returns True if the work was written to the CE"""
+    title = cpdl_work['title']
+    composer = cpdl_work['composer']
     if composer is not None:
-        source = f'https://cpdl.org/wiki/index.php/{composer.replace(" ", "_")}'
-        existing_composer_ceid = get_existing_person_by_source(source)
-        if not existing_composer_ceid:
-            existing_composer_ceid = import_cpdl_composer(composer)
+        existing_composer_ceid = get_or_import_cpdl_composer(composer)
         if existing_composer_ceid:
-            musiccomp_ceid = get_or_create_musiccomposition(composition['work'])
+            import_journal.mark(journal, title, import_journal.PERSONS)
+            musiccomp_ceid = get_or_create_musiccomposition(cpdl_work['work'])
+            import_journal.mark(journal, title, import_journal.COMPOSITION)
             link_musiccomposition_and_composers(musiccomp_ceid, [existing_composer_ceid])
-            mediaobjects = cpdl.composition_wikitext_to_mediaobjects(work_wikitext)
-            for mo in mediaobjects:
+            for mo in cpdl_work['mediaobjects']:
                 xml = mo["xml"]
                 xmlmediaobject_ceid = get_or_create_mediaobject(xml)
                 link_musiccomposition_and_mediaobject(composition_id=musiccomp_ceid,
@@ -522,29 +681,168 @@ def import_cpdl_work_wikitext(work_wikitext):
                     # In CPDL, we know that PDFs are generated from the source xml file
                     # TODO: Are there any situations where this isn't the case?
                     link_mediaobject_was_derived_from(source_id=xmlmediaobject_ceid, derived_id=pdfmediaobject_ceid)
+            import_journal.mark(journal, title, import_journal.LINKS)
+            return True
         else:
+            # This can be a temporary failure to load the composer, so it isn't marked as skipped and
+            # a resumed import tries it again
             logger.info(" - missing composer?")
+    else:
+        logger.info(" - No composer, skipping")
+        import_journal.mark(journal, title, import_journal.SKIPPED)
+    return False
+
+
+def import_cpdl_work_wikitext(work_wikitext, journal=None):
+    """Import a CPDL work, its composer and its files.
+    If `journal` is set, record the progress of the import of this work in it"""
+    cpdl_work = build_cpdl_work(work_wikitext)
+    import_journal.mark(journal, work_wikitext['title'], import_journal.PARSED)
+    write_cpdl_work(cpdl_work, journal=journal)
+
 
+def prefetch_cpdl_works(works):
+    """Fill the identity cache with all works in `works` (the result of get_wikitext_for_titles)
+    and their composers that already exist in the CE"""
+    work_sources = [f'https://cpdl.org/wiki/index.php/{work["title"].replace(" ", "_")}' for work in works]
+    composers = [c for c in cpdl.get_composers_for_works(works) if c != "None"]
+    composer_sources = [f'https://cpdl.org/wiki/index.php/{composer.replace(" ", "_")}' for composer in composers]
+    prefetch_existing_by_source("MusicComposition", work_sources)
+    prefetch_existing_by_source("Person", composer_sources)
 
-def import_cpdl_work(work_names):
-    """Import a single work"""
+
+def _import_cpdl_work_wikitext_logged(work):
+    logger.info("Importing CPDL work %s", work['title'])
+    import_cpdl_work_wikitext(work)
+
+
+def import_cpdl_work(work_names, num_workers=1):
+    """Import a list of works, running `num_workers` imports at the same time.
+    Returns the titles of works that failed to import"""
     wikitext = cpdl.get_wikitext_for_titles(work_names)
-    for work in wikitext:
-        logger.info("Importing CPDL work %s", work['title'])
-        import_cpdl_work_wikitext(work)
+    prefetch_cpdl_works(wikitext)
+    failed = workers.run_pool(_import_cpdl_work_wikitext_logged, wikitext, num_workers)
+    return [work['title'] for work in failed]
 
 
-def import_cpdl_works_for_category(cpdl_category):
+def import_cpdl_works_for_category(cpdl_category, journal=None, num_writers=1, revisions=None):
     """Given a category in CPDL, find all of its works. Then, filter to only include works
     with a musicxml file. Import each of these works and the xml files.
-    This assumes that import_cpdl_composers_for_category has been run first and that Person
-    objects exist in the CE for each Composer"""
 
-    titles = cpdl.get_titles_in_category(cpdl_category)
-    wikitext = cpdl.get_wikitext_for_titles(titles)
-    xmlwikitext = cpdl.get_works_with_xml(wikitext)
+    The import runs as a pipeline, so that pages are loaded from CPDL at the same time as works
+    are written to the CE:
+      category members -> wikitext of 50 titles -> filter for xml -> parse work and load file details -> write to CE
+    `num_writers` works are written to the CE at the same time.
 
-    total = len(xmlwikitext)
-    for i, work in enumerate(xmlwikitext, 1):
-        logger.info("Importing CPDL work %s/%s %s", i, total, work['title'])
-        import_cpdl_work_wikitext(work)
+    If `journal` is set, works that it records as complete are not imported again.
+    If `revisions` (a RevisionIndex) is set, only pages which have changed since they were last
+    imported are loaded and written to the CE.
+
+    Returns:
+        a list of (stage, item) of the items that failed to import
+    """
+    completed = set()
+    if journal is not None:
+        completed = journal.completed_titles()
+        logger.info("Skipping %s works which were already imported", len(completed))
+
+    def title_batches():
+        for titles in cpdl.iter_titles_in_category(cpdl_category):
+            titles = [t for t in titles if t not in completed]
+            yield from chunks(titles, 50)
+
+    # The current revision of each page that is being imported, to add to `revisions` once it's imported
+    current_revisions = {}
+
+    def fetch(titles):
+        if revisions is None:
+            pages = cpdl.get_wiki_content_for_pages(titles)
+        else:
+            page_revisions = cpdl.get_revisions_for_pages(titles)
+            changed = revisions.changed("cpdl", page_revisions)
+            logger.info("%s of %s pages changed since the last import", len(changed), len(titles))
+            current_revisions.update({title: page_revisions[title] for title in changed})
+            pages = cpdl.get_wiki_content_for_revisions([page_revisions[title]["revid"] for title in changed])
+        for page in pages:
+            import_journal.mark(journal, page['title'], import_journal.FETCHED)
+        return [pages]
+
+    def filter_xml(pages):
+        xml_pages = cpdl.get_works_with_xml(pages)
+        xml_titles = {page['title'] for page in xml_pages}
+        for page in pages:
+            if page['title'] not in xml_titles:
+                import_journal.mark(journal, page['title'], import_journal.SKIPPED)
+                revision_index.record(revisions, "cpdl", page['title'], current_revisions.pop(page['title'], None))
+        prefetch_cpdl_works(xml_pages)
+        return xml_pages
+
+    def build(work):
+        cpdl_work = build_cpdl_work(work)
+        import_journal.mark(journal, work['title'], import_journal.PARSED)
+        return [cpdl_work]
+
+    def write(cpdl_work):
+        logger.info("Importing CPDL work %s", cpdl_work['title'])
+        title = cpdl_work['title']
+        revision = current_revisions.pop(title, None)
+        # Only record the revision if the work was written, so that a skipped work is tried again next time
+        if write_cpdl_work(cpdl_work, journal=journal):
+            revision_index.record(revisions, "cpdl", title, revision)
+        return []
+
+    stages = [Stage("fetch wikitext", fetch, workers=2),
+              Stage("filter xml", filter_xml),
+              Stage("build work", build, workers=2),
+              Stage("write to CE", write, workers=num_writers)]
+    return Pipeline(stages).run(title_batches())
+
+
+def import_imslp_works(pages, journal=None, dump_path=None, revisions=None):
+    """Import a list of IMSLP work pages. Works and composers that already exist in the CE
+    are looked up in bulk before the import starts.
+
+    If `journal` is set, works that it records as complete are not imported again.
+    If `dump_path` is set, the composer of each work is read from this dump of IMSLP
+    pages (written by `imslp.api_all_pages`) instead of the IMSLP API. The other metadata
+    of each work still comes from the API.
+    If `revisions` (a RevisionIndex) is set, only pages which have changed since they were last imported are imported.
+    The changed revision of each page is loaded, instead of a cached copy of the page"""
+    if journal is not None:
+        completed = journal.completed_titles()
+        logger.info("Skipping %s works which were already imported", len(completed))
+        pages = [p for p in pages if p not in completed]
+    page_revisions = {}
+    if revisions is not None:
+        for titles in chunks(pages, 50):
+            page_revisions.update(imslp.get_revisions_for_pages(titles))
+        changed = set(revisions.changed("imslp", page_revisions))
+        logger.info("%s of %s pages changed since the last import", len(changed), len(pages))
+        pages = [p for p in pages if p.replace("_", " ") in changed]
+    dump = imslp.load_all_pages_dump(dump_path, titles=pages) if dump_path else None
+    prefetch_imslp_works(pages, dump=dump)
+    for p in pages:
+        title = p.replace("_", " ")
+        page = imslp.WorkPage(p, dump_page=(dump or {}).get(title), revision=page_revisions.get(title))
+        if load_musiccomposition_from_imslp_name(p, journal=journal, dump=dump, page=page):
+            revision_index.record(revisions, "imslp", title, page_revisions.get(title))
+
+
+def import_imslp_works_for_category(category, journal=None, dump_path=None, revisions=None):
+    """Import all works in an IMSLP category. See `import_imslp_works`"""
+    import_imslp_works(imslp.category_pagelist(category), journal=journal, dump_path=dump_path, revisions=revisions)
+
+
+def import_imslp_works_from_dump(dump_path, composer=None, journal=None):
+    """Import all works in a dump of IMSLP pages (written by `imslp.api_all_pages`) which have musicxml files.
+
+    Arguments:
+        dump_path: the dump to read
+        composer: if set, only import works by this composer (a Category: page name)
+        journal: if set, works that it records as complete are not imported again
+    """
+    pages = []
+    for page in imslp.iter_all_pages_dump(dump_path):
+        if composer is None or page.get("parent") == composer:
+            pages.append(page["id"])
+    import_imslp_works(list(imslp.iter_works_for_xml(pages, workers=2)), journal=journal, dump_path=dump_path)
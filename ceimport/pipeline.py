@@ -0,0 +1,94 @@
+import queue
+import threading
+
+from ceimport import logger
+
+# Maximum number of items waiting between two stages. When a queue is full the stage
+# before it waits, so a slow stage slows down the ones before it instead of using more memory
+QUEUE_SIZE = 100
+
+_DONE = object()
+
+
+class Stage:
+    """A step of a pipeline.
+
+    Arguments:
+        name: a name for the stage, used in logging
+        function: called with each item that reaches this stage. It returns an iterable of
+                  items to pass on to the next stage (which can be empty)
+        workers: the number of threads that run this stage
+    """
+
+    def __init__(self, name, function, workers=1):
+        self.name = name
+        self.function = function
+        self.workers = workers
+
+
+class Pipeline:
+    """Run a number of stages at the same time, each one in its own threads, connected by bounded queues"""
+
+    def __init__(self, stages, queue_size=QUEUE_SIZE):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.failed = []
+        self._lock = threading.Lock()
+        self._running = [stage.workers for stage in stages]
+
+    def _feed(self, items):
+        first = self.queues[0]
+        try:
+            for item in items:
+                first.put(item)
+        except Exception:
+            # The rest of the input is lost, so report it as a failure instead of
+            # letting the run look complete
+            logger.exception("Failed to read pipeline input")
+            with self._lock:
+                self.failed.append(("read input", None))
+        finally:
+            for _ in range(self.stages[0].workers):
+                first.put(_DONE)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        inq = self.queues[index]
+        outq = self.queues[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = inq.get()
+            if item is _DONE:
+                break
+            try:
+                for result in stage.function(item) or []:
+                    if outq is not None:
+                        outq.put(result)
+            except Exception:
+                logger.exception("Stage %s failed on %s", stage.name, item)
+                with self._lock:
+                    self.failed.append((stage.name, item))
+
+        # The last worker of a stage to finish tells the next stage that there are no more items
+        with self._lock:
+            self._running[index] -= 1
+            last = self._running[index] == 0
+        if last and outq is not None:
+            for _ in range(self.stages[index + 1].workers):
+                outq.put(_DONE)
+
+    def run(self, items):
+        """Pass each item of `items` through all of the stages.
+
+        Returns:
+            a list of (stage name, item) of items that raised an exception in a stage.
+            If reading `items` raised an exception, it contains ("read input", None)
+        """
+        threads = [threading.Thread(target=self._feed, args=(items,), daemon=True)]
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(target=self._work, args=(index,), daemon=True))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.failed
@@ -0,0 +1,145 @@
+import email.utils
+import threading
+import time
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+
+from ceimport import logger
+
+# Maximum sustained number of requests per second that we make to each site.
+# A host matches an entry if it is the same domain or a subdomain of it
+HOST_RATES = {
+    "imslp.org": 1,
+    "cpdl.org": 2,
+    "musicbrainz.org": 1,
+    "wikidata.org": 5,
+    "wikipedia.org": 5,
+    "viaf.org": 2,
+    "worldcat.org": 2,
+    "isni.org": 2,
+    "id.loc.gov": 2,
+}
+DEFAULT_RATE = 5
+
+# Number of times that a request is retried if the server tells us that we are making too many requests
+RATE_LIMIT_RETRIES = 3
+# Number of seconds to wait after a 429 response with no Retry-After header
+DEFAULT_RETRY_AFTER = 10
+
+
+class TokenBucket:
+    """A thread-safe token bucket which allows `rate` requests per second, with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        # The time that _tokens was calculated at. This can be in the future if the bucket is paused
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self):
+        """Take a token from the bucket, waiting until one is available"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Reserve a token even if it isn't available yet. A negative balance means that
+            # callers are queued, and each one waits for its own token to arrive
+            self._tokens -= 1
+            available_at = self._updated + max(0, -self._tokens) / self.rate
+            wait = available_at - now
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Don't hand out any more tokens for `seconds`"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            until = now + seconds
+            if until > self._updated:
+                self._tokens = min(self._tokens, 0)
+                self._updated = until
+
+
+class RateLimiter:
+    """A collection of token buckets, one for each host that we make requests to"""
+
+    def __init__(self, rates, default_rate=DEFAULT_RATE):
+        self.rates = rates
+        self.default_rate = default_rate
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket_key(self, host):
+        """The entry in `rates` that `host` is part of, or the host itself if there isn't one"""
+        host = (host or "").lower()
+        parts = host.split(".")
+        for i in range(len(parts) - 1):
+            domain = ".".join(parts[i:])
+            if domain in self.rates:
+                return domain
+        return host
+
+    def bucket(self, host):
+        key = self._bucket_key(host)
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.rates.get(key, self.default_rate))
+            return self._buckets[key]
+
+    def acquire(self, host):
+        self.bucket(host).acquire()
+
+    def pause(self, host, seconds):
+        self.bucket(host).pause(seconds)
+
+
+limiter = RateLimiter(HOST_RATES)
+
+
+def parse_retry_after(value):
+    """Get the number of seconds to wait from the value of a Retry-After header,
+    which can be a number of seconds or a date. Returns None if it can't be parsed"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, retry_date.timestamp() - time.time())
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """An HTTPAdapter which waits for the request's host to have capacity in the shared `limiter`
+    before sending a request. If a site responds with 429 Too Many Requests (or 503 with a Retry-After header),
+    all requests to that host are paused for the time it asks for and the request is retried"""
+
+    def __init__(self, *args, rate_limiter=limiter, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).hostname
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self.rate_limiter.acquire(host)
+            response = super().send(request, **kwargs)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            too_many_requests = response.status_code == 429 or (response.status_code == 503 and retry_after is not None)
+            if not too_many_requests or attempt == RATE_LIMIT_RETRIES:
+                return response
+            if retry_after is None:
+                retry_after = DEFAULT_RETRY_AFTER
+            logger.info("Too many requests to %s, waiting %s seconds", host, retry_after)
+            self.rate_limiter.pause(host, retry_after)
+            response.close()
+        return response
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+
+DEFAULT_REVISION_INDEX_PATH = "revision-index.sqlite"
+
+
+class RevisionIndex:
+    """The revision of each wiki page (on IMSLP or CPDL) that was last imported, stored in an sqlite database.
+
+    When a category is imported again, pages whose current revision is the same as the one
+    in the index haven't changed and don't need to be imported.
+    """
+
+    def __init__(self, path=DEFAULT_REVISION_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS revisions (
+                site TEXT NOT NULL,
+                title TEXT NOT NULL,
+                revid INTEGER NOT NULL,
+                timestamp TEXT,
+                PRIMARY KEY (site, title))""")
+
+    def get(self, site, title):
+        """Returns the revision id of `title` that was last imported, else None"""
+        with self._lock:
+            row = self._db.execute("SELECT revid FROM revisions WHERE site = ? AND title = ?",
+                                   (site, title)).fetchone()
+        return row[0] if row else None
+
+    def set(self, site, title, revid, timestamp=None):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO revisions (site, title, revid, timestamp) VALUES (?, ?, ?, ?)",
+                             (site, title, revid, timestamp))
+
+    def changed(self, site, revisions):
+        """Given a dict of title -> {"revid", "timestamp"} of the current revision of some pages,
+        return the titles whose revision is different to the one in the index"""
+        return [title for title, revision in revisions.items() if self.get(site, title) != revision["revid"]]
+
+    def close(self):
+        self._db.close()
+
+
+def record(index, site, title, revision):
+    """Record that `revision` of `title` was imported, if there is an index for this import"""
+    if index is not None and revision is not None:
+        index.set(site, title, revision["revid"], revision.get("timestamp"))
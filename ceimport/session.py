@@ -0,0 +1,65 @@
+import threading
+
+import requests
+import requests_cache
+
+from ceimport.ratelimit import RateLimitedAdapter
+
+# Name of the requests_cache sqlite database which stores responses from all sites.
+# If None, use the default name of the installed version of requests_cache
+CACHE_NAME = None
+# Number of hosts to keep a connection pool for, and the number of connections kept open in each pool
+POOL_CONNECTIONS = 20
+POOL_MAXSIZE = 10
+MAX_RETRIES = 5
+
+_session = None
+_uncached_session = None
+_session_lock = threading.Lock()
+
+
+def _mount_adapter(session):
+    adapter = RateLimitedAdapter(max_retries=MAX_RETRIES, pool_connections=POOL_CONNECTIONS,
+                                 pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def configure(cache_name=None, pool_connections=None, pool_maxsize=None):
+    """Change the settings of the shared session. This must be called before the session is first used"""
+    global CACHE_NAME, POOL_CONNECTIONS, POOL_MAXSIZE
+    if _session is not None or _uncached_session is not None:
+        raise RuntimeError("The session has already been created")
+    if cache_name is not None:
+        CACHE_NAME = cache_name
+    if pool_connections is not None:
+        POOL_CONNECTIONS = pool_connections
+    if pool_maxsize is not None:
+        POOL_MAXSIZE = pool_maxsize
+
+
+def get_session():
+    """Get the http session that is shared by all sites. It's created the first time that it's needed,
+    so that the cache database isn't opened until a request is made"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            if CACHE_NAME:
+                session = requests_cache.CachedSession(CACHE_NAME)
+            else:
+                session = requests_cache.CachedSession()
+            _mount_adapter(session)
+            _session = session
+        return _session
+
+
+def get_uncached_session():
+    """Get a session which has the same rate limits as `get_session`, but doesn't cache responses.
+    Use this for requests whose response changes often, like the list of pages in a category"""
+    global _uncached_session
+    with _session_lock:
+        if _uncached_session is None:
+            session = requests.Session()
+            _mount_adapter(session)
+            _uncached_session = session
+        return _uncached_session
@@ -3,17 +3,12 @@ from typing import List
 
 import mediawiki
 import requests
-import requests_cache
 import mwparserfromhell as mwph
-from requests.adapters import HTTPAdapter
 
-from ceimport import chunks
-
-
-session = requests_cache.CachedSession()
-adapter = HTTPAdapter(max_retries=5)
-session.mount("https://", adapter)
-session.mount("http://", adapter)
+from ceimport import chunks, in_title_order
+from ceimport.session import get_session, get_uncached_session
+from ceimport.wikitext import parse_wikitext
+from ceimport.workers import map_in_order
 
 
 def get_mediawiki():
@@ -32,7 +27,7 @@ def get_fileurl_from_media(media: List[str]):
               "iiprop": "url"}
     url = 'http://www.cpdl.org/wiki/api.php'
 
-    r = session.get(url, params=params)
+    r = get_session().get(url, params=params)
     r.raise_for_status()
     try:
         j = r.json()
@@ -61,11 +56,11 @@ def get_fileurl_from_media(media: List[str]):
     return ret
 
 
-def get_wiki_content_for_pages(pages):
-    if len(pages) > 50:
+def get_wiki_content_for_pages(titles):
+    if len(titles) > 50:
         raise ValueError("can only do up to 50 pages")
 
-    query = "|".join(pages)
+    query = "|".join(titles)
     params = {
         "action": "query",
         "prop": "revisions",
@@ -78,7 +73,7 @@ def get_wiki_content_for_pages(pages):
     url = 'http://www.cpdl.org/wiki/api.php'
 
     try:
-        r = session.get(url, params=params)
+        r = get_session().get(url, params=params)
     except requests.exceptions.ConnectionError:
         return []
     r.raise_for_status()
@@ -87,7 +82,8 @@ def get_wiki_content_for_pages(pages):
     except ValueError:
         return []
 
-    pages = j.get("query", {}).get("pages", [])
+    query = j.get("query", {})
+    pages = query.get("pages", [])
 
     """
     cpdl api returns a list of pages
@@ -105,9 +101,88 @@ def get_wiki_content_for_pages(pages):
             text = revisions[0].get("slots", {}).get("main", {}).get("content")
             ret.append({"title": title, "content": text})
 
+    return in_title_order(ret, titles, query.get("normalized", []))
+
+
+def get_wiki_content_for_revisions(revids):
+    """Load the wikitext of up to 50 specific revisions of pages (e.g. the ones returned by
+    `get_revisions_for_pages`). Unlike loading a page by title, the response for a revision never
+    changes, so it's safe to use a cached response for it"""
+    if len(revids) > 50:
+        raise ValueError("can only do up to 50 revisions")
+
+    params = {
+        "action": "query",
+        "prop": "revisions",
+        "revids": "|".join(str(revid) for revid in revids),
+        "rvslots": "main",
+        "rvprop": "ids|content",
+        "formatversion": "2",
+        "format": "json"
+    }
+    url = 'http://www.cpdl.org/wiki/api.php'
+
+    r = get_session().get(url, params=params)
+    r.raise_for_status()
+    try:
+        j = r.json()
+    except ValueError:
+        return []
+
+    order = {revid: i for i, revid in enumerate(revids)}
+    ret = []
+    for page in j.get("query", {}).get("pages", []):
+        for revision in page.get("revisions", []):
+            text = revision.get("slots", {}).get("main", {}).get("content")
+            ret.append((order.get(revision.get("revid"), len(revids)), {"title": page["title"], "content": text}))
+    return [page for _, page in sorted(ret, key=lambda r: r[0])]
+
+
+def get_revisions_for_pages(titles):
+    """Get the id and timestamp of the current revision of up to 50 pages.
+    This always makes a request to CPDL, because the response changes each time a page is edited.
+
+    Returns:
+        a dict of page title -> {"revid": revision id, "timestamp": time of the revision}
+    """
+    if len(titles) > 50:
+        raise ValueError("can only do up to 50 pages")
+
+    params = {
+        "action": "query",
+        "prop": "revisions",
+        "titles": "|".join(titles),
+        "rvprop": "ids|timestamp",
+        "formatversion": "2",
+        "format": "json"
+    }
+    url = 'http://www.cpdl.org/wiki/api.php'
+
+    r = get_uncached_session().get(url, params=params)
+    r.raise_for_status()
+    j = r.json()
+
+    ret = {}
+    for page in j.get("query", {}).get("pages", []):
+        revisions = page.get("revisions")
+        if revisions:
+            ret[page["title"]] = {"revid": revisions[0]["revid"], "timestamp": revisions[0].get("timestamp")}
     return ret
 
 
+def iter_wiki_content_for_pages(titles, workers=1):
+    """Load the wikitext of any number of titles, 50 at a time.
+
+    Arguments:
+        titles: a list of page titles
+        workers: the number of chunks to request at the same time
+
+    Returns:
+        a generator of lists of pages, one for each chunk of 50 titles, in the same order as `titles`
+    """
+    return map_in_order("cpdl.org", get_wiki_content_for_pages, chunks(titles, 50), workers)
+
+
 def get_works_with_xml(pages):
     """
     Arguments:
@@ -121,7 +196,7 @@ def get_works_with_xml(pages):
 
 
 def composition_wikitext_to_music_composition(wikitext):
-    parsed = mwph.parse(wikitext["content"])
+    parsed = parse_wikitext(wikitext["content"])
     url = wikitext["title"].replace(" ", "_")
     composer = None
     inlanguage = None
@@ -163,29 +238,23 @@ def get_file_pairs_from_composition_wikitext(wikitext):
     *{{PostedDate|2014-11-24}} {{CPDLno|33477}} [[Media:Torrejon-A_este_sol_peregrino.pdf|{{pdf}}]] [[Media:Torrejon-A_este_sol_peregrino.mid|{{mid}}]] [[Media:Torrejon-A_este_sol_peregrino.mxl|{{XML}}]] [[Media:Torrejon-A_este_sol_peregrino.musx|{{F14}}]] (Finale 2014)
     Look for these, and return ones that include an {{XML}} link. If there is also a PDF, return that too
     """
-    parsed = mwph.parse(wikitext['content'])
-
-    # Look for nodes which are {{CPDLno}} templates
-    cpdl_nodes = [template for template in parsed.filter_templates() if template.name == 'CPDLno']
-    cpdl_nodes.append(parsed.nodes[-1])
+    parsed = parse_wikitext(wikitext['content'])
+
+    # Split the nodes of the page into groups, each starting at a {{CPDLno}} template and
+    # going up to the next one (or the end of the page). Nodes before the first {{CPDLno}}
+    # aren't part of any group
+    groups = []
+    for node in parsed.nodes:
+        if isinstance(node, mwph.nodes.Template) and node.name == 'CPDLno':
+            groups.append([])
+        elif groups:
+            groups[-1].append(node)
 
     ret = []
 
-    # For each of these nodes, from the node to the next, see if there is
-    # a wikilink with {{XML}}. If so, return both the pdf in this range if it exists
-    # and the xml file
-    # e.g. nodes 3, 12, 15. We append the last node so that we can group them
-    # into 3-12, 12-15, 15-end
-    parsed_nodes = parsed.nodes
-    for i in range(len(cpdl_nodes)-1):
-        start = cpdl_nodes[i]
-        end = cpdl_nodes[i+1]
-        try:
-            start_i = parsed_nodes.index(start)
-            end_i = parsed_nodes.index(end)
-        except ValueError:
-            continue
-        relevant_nodes = parsed_nodes[start_i:end_i]
+    # For each group, see if there is a wikilink with {{XML}}. If so, return both
+    # the pdf in this group if it exists and the xml file
+    for relevant_nodes in groups:
         wikilinks = [n for n in relevant_nodes if isinstance(n, mwph.nodes.Wikilink)]
         xml_templates = [str(n.title) for n in wikilinks if n.text == "{{XML}}"]
         pdf_templates = [str(n.title) for n in wikilinks if n.text == "{{pdf}}"]
@@ -269,7 +338,7 @@ def composition_wikitext_to_mediaobjects(wikitext):
 
 
 def composer_wikitext_to_person(wikitext):
-    parsed = mwph.parse(wikitext["content"])
+    parsed = parse_wikitext(wikitext["content"])
     name = wikitext["title"]
     url = name.replace(" ", "_")
     # TODO: Born, Died, Biography, Image
@@ -317,17 +386,23 @@ def composer_wikitext_to_person(wikitext):
     }
 
 
-def get_wikitext_for_titles(titles):
+def iter_wikitext_for_titles(titles, workers=1):
+    """Load the wikitext of a list of titles, yielding each page as soon as the
+    chunk of 50 titles that it is in has been loaded.
+
+    Arguments:
+        titles: a list of page titles
+        workers: the number of chunks to load at the same time. These are loaded in the background,
+                 so with 1 the next chunk is loaded while the pages of the current one are used
+    """
     num_iterations = int(len(titles) / 50)
-    i = 1
-    all_pages = []
-    for items in chunks(titles, 50):
+    for i, pages in enumerate(iter_wiki_content_for_pages(titles, workers), 1):
         print(f"{i}/{num_iterations}")
-        i += 1
-        pages = get_wiki_content_for_pages(items)
-        all_pages.extend(pages)
+        yield from pages
+
 
-    return all_pages
+def get_wikitext_for_titles(titles):
+    return list(iter_wikitext_for_titles(titles))
 
 
 def get_composers_for_works(works):
@@ -354,6 +429,39 @@ def get_titles_in_category(category):
     return mw.categorymembers(category, results=None, subcategories=True)[0]
 
 
+def iter_titles_in_category(category):
+    """Get the titles of the pages in a category, yielding a list for each page of
+    API results (up to 500 titles) as soon as it is loaded.
+    Like `get_titles_in_category`, this doesn't include subcategories
+
+    Arguments:
+        category: the category title (without the Category: prefix) to get page titles from
+    """
+    params = {
+        "action": "query",
+        "list": "categorymembers",
+        "cmprop": "ids|title|type",
+        "cmtype": "page|file",
+        "cmlimit": "500",
+        "cmtitle": f"Category:{category}",
+        "format": "json"
+    }
+    url = 'http://www.cpdl.org/wiki/api.php'
+
+    last_cont = None
+    while True:
+        r = get_uncached_session().get(url, params=params)
+        r.raise_for_status()
+        j = r.json()
+        yield [member["title"] for member in j.get("query", {}).get("categorymembers", [])]
+
+        cont = j.get("continue")
+        if not cont or cont == last_cont:
+            break
+        last_cont = cont
+        params.update(cont)
+
+
 def main():
     titles = cpdl.get_titles_in_category("4-part choral music")
     wikitext = cpdl.get_wikitext_for_titles(titles)
@@ -1,40 +1,21 @@
 import base64
+import html
 import json
-import random
+import os
 import re
 import sys
-import time
 import urllib
 from typing import List
 
 from bs4 import BeautifulSoup
 import requests
-import requests_cache
 from mediawiki import mediawiki
 import mwparserfromhell as mwph
-from requests.adapters import HTTPAdapter
 
-from ceimport import chunks, logger
-
-
-def make_throttle_hook():
-    """
-    Returns a response hook function which sleeps for `timeout` seconds if
-    response is not cached
-    """
-    def hook(response, *args, **kwargs):
-        if not getattr(response, 'from_cache', False):
-            print('sleeping')
-            time.sleep(random.randint(500, 3000) / 1000.0)
-        return response
-    return hook
-
-
-session = requests_cache.CachedSession()
-session.hooks = {'response': make_throttle_hook()}
-adapter = HTTPAdapter(max_retries=5)
-session.mount("https://", adapter)
-session.mount("http://", adapter)
+from ceimport import chunks, in_title_order, logger
+from ceimport.session import get_session, get_uncached_session
+from ceimport.wikitext import parse_wikitext
+from ceimport.workers import map_in_order
 
 
 def get_titles_in_category(mw, category):
@@ -47,17 +28,19 @@ def get_titles_in_category(mw, category):
     return mw.categorymembers(category, results=None, subcategories=True)[0]
 
 
-def read_source(source: str) -> str:
+def read_source(source: str, cached: bool = True) -> str:
     """Read a URL and return the HTML string.
 
     Args:
         source: the URL of the page to load
+        cached: if False, always load the page from IMSLP instead of using a cached response
 
     Returns:
         the contents of the page
     """
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36'}
+    session = get_session() if cached else get_uncached_session()
     r = session.get(source, headers=headers)
     try:
         r.raise_for_status()
@@ -69,15 +52,104 @@ def read_source(source: str) -> str:
 def get_page_title(source):
     page = read_source(source)
     if page is not None:
-        bs = BeautifulSoup(page, features="lxml")
-        title = bs.find("title")
-        if title:
-            return title.text
+        return page_title_from_html(page)
+
+
+def page_title_from_html(page):
+    bs = BeautifulSoup(page, features="lxml")
+    title = bs.find("title")
+    if title:
+        return title.text
+
+
+_NOT_LOADED = object()
+
+
+class WorkPage:
+    """The resources of an IMSLP work page that are used to import it: the html page, the IMSLP API
+    metadata and the wikitext. Each one is loaded from IMSLP the first time it's used, and then kept,
+    so that all of the functions that import parts of a work can share them.
+
+    Arguments:
+        work_name: the title of the work page
+        dump_page: if set, the page from the dump written by `api_all_pages`. The composer of the work is read
+                   from it, but the other metadata of the work (which the dump doesn't have) still comes from the IMSLP API
+        revision: if set, the revision of the page to import (from `get_revisions_for_pages`). The wikitext
+                  of this revision is loaded, and the html page and IMSLP API metadata are loaded without
+                  using cached responses, because the page changed since they may have been cached
+    """
+
+    def __init__(self, work_name, dump_page=None, revision=None):
+        self.work_name = work_name
+        self.url = "https://imslp.org/wiki/" + work_name.replace(" ", "_")
+        self.dump_page = dump_page
+        self.revision = revision
+        self._html = _NOT_LOADED
+        self._soup = _NOT_LOADED
+        self._title = _NOT_LOADED
+        self._api_page = _NOT_LOADED
+        self._wikitext = _NOT_LOADED
+        self._parsed = _NOT_LOADED
+
+    @property
+    def html(self):
+        """The html of the page, or None if it couldn't be loaded"""
+        if self._html is _NOT_LOADED:
+            self._html = read_source(self.url, cached=self.revision is None)
+        return self._html
+
+    @property
+    def title(self):
+        """The <title> of the html page"""
+        if self._title is _NOT_LOADED:
+            title = self.soup.find("title") if self.soup is not None else None
+            self._title = title.text if title else None
+        return self._title
+
+    @property
+    def soup(self):
+        """The parsed html of the page, or None if it couldn't be loaded"""
+        if self._soup is _NOT_LOADED:
+            self._soup = BeautifulSoup(self.html, features="lxml") if self.html is not None else None
+        return self._soup
+
+    @property
+    def api_page(self):
+        """The metadata of the page from the IMSLP API"""
+        if self._api_page is _NOT_LOADED:
+            self._api_page = imslp_api_raw_query(self.work_name.replace("_", " "),
+                                                 cached=self.revision is None).get('0', {})
+        return self._api_page
+
+    @property
+    def composer(self):
+        """The composer (the parent Category: page) of the work, from the dump if it's set, otherwise the IMSLP API"""
+        if self.dump_page is not None and self.dump_page.get("parent"):
+            return self.dump_page["parent"]
+        return self.api_page.get("parent")
+
+    @property
+    def wikitext(self):
+        """The wikitext of the page as returned by `get_wiki_content_for_pages`, or None if it doesn't exist"""
+        if self._wikitext is _NOT_LOADED:
+            if self.revision is not None:
+                wikitext = get_wiki_content_for_revisions([self.revision["revid"]])
+            else:
+                wikitext = get_wiki_content_for_pages([self.work_name])
+            self._wikitext = wikitext[0] if wikitext else None
+        return self._wikitext
+
+    @property
+    def parsed(self):
+        """The parsed wikitext of the page"""
+        if self._parsed is _NOT_LOADED:
+            self._parsed = parse_wikitext(self.wikitext["content"])
+        return self._parsed
 
 
 def special_link_to_download_url(special_link, download_id):
     url = ""
-    r = session.get(url, cookies={"imslpdisclaimeraccepted": "yes"}, allow_redirects=False)
+    r = get_session().get(url, cookies={"imslpdisclaimeraccepted": "yes"}, allow_redirects=False)
     location = r.headers['Location']
     return location
 
@@ -104,12 +176,15 @@ def category_pagelist(category_name: str):
     return list_of_titles
 
 
-def get_wiki_content_for_pages(pages: List[str]):
-    """Use the mediawiki api to load Wikitext for a list of page"""
-    if len(pages) > 50:
+def get_wiki_content_for_pages(titles: List[str]):
+    """Use the mediawiki api to load Wikitext for a list of page.
+    If the response is too large for the api to return all revisions at once, it tells us to
+    continue the query (with `continue`, or `query-continue` on older versions of mediawiki),
+    and we make more requests until we have all of them"""
+    if len(titles) > 50:
         raise ValueError("can only do up to 50 pages")
 
-    query = "|".join(pages)
+    query = "|".join(titles)
     params = {
         "action": "query",
         "prop": "revisions",
@@ -117,20 +192,42 @@ def get_wiki_content_for_pages(pages: List[str]):
         "rvslots": "*",
         "rvprop": "content",
         "formatversion": "2",
-        "format": "json"
+        "format": "json",
+        # Ask for the newer style of continuing a query
+        "continue": ""
     }
     url = 'https://imslp.org/api.php'
 
-    r = session.get(url, params=params)
+    pages = {}
+    normalized = []
+    continue_params = {}
+    while True:
+        r = get_session().get(url, params={**params, **continue_params})
 
-    r.raise_for_status()
-    try:
-        j = r.json()
-    except ValueError:
-        return []
+        r.raise_for_status()
+        try:
+            j = r.json()
+        except ValueError:
+            break
 
-    # ["query"]["pages"]["5827"]["revisions"][0]["*"]
-    pages = j.get("query", {}).get("pages", {})
+        # ["query"]["pages"]["5827"]["revisions"][0]["*"]
+        query = j.get("query", {})
+        normalized.extend(query.get("normalized", []))
+        for pageid, page in query.get("pages", {}).items():
+            # Pages which are repeated in a continued response only have the revisions that were missing before
+            if pageid in pages and page.get("revisions"):
+                pages[pageid].setdefault("revisions", []).extend(page["revisions"])
+            else:
+                pages.setdefault(pageid, page)
+
+        if "continue" in j:
+            continue_params = j["continue"]
+        elif "query-continue" in j:
+            # Older versions of mediawiki return the parameters to continue each module of the query
+            # e.g. {"revisions": {"rvcontinue": ...}}
+            continue_params = {k: v for module in j["query-continue"].values() for k, v in module.items()}
+        else:
+            break
 
     """
     imslp api returns a dictionary where page ids are the key values
@@ -148,29 +245,155 @@ def get_wiki_content_for_pages(pages: List[str]):
             text = revisions[0].get("*")
             ret.append({"title": title, "content": text})
 
+    return in_title_order(ret, titles, normalized)
+
+
+def get_wiki_content_for_revisions(revids):
+    """Load the wikitext of up to 50 specific revisions of pages (e.g. the ones returned by
+    `get_revisions_for_pages`). Unlike loading a page by title, the response for a revision never
+    changes, so it's safe to use a cached response for it"""
+    if len(revids) > 50:
+        raise ValueError("can only do up to 50 revisions")
+
+    params = {
+        "action": "query",
+        "prop": "revisions",
+        "revids": "|".join(str(revid) for revid in revids),
+        "rvslots": "*",
+        "rvprop": "ids|content",
+        "formatversion": "2",
+        "format": "json"
+    }
+    url = 'https://imslp.org/api.php'
+
+    r = get_session().get(url, params=params)
+    r.raise_for_status()
+    try:
+        j = r.json()
+    except ValueError:
+        return []
+
+    order = {revid: i for i, revid in enumerate(revids)}
+    ret = []
+    # The imslp api returns a dictionary where page ids are the keys
+    for page in j.get("query", {}).get("pages", {}).values():
+        for revision in page.get("revisions", []):
+            position = order.get(revision.get("revid"), len(revids))
+            ret.append((position, {"title": page["title"], "content": revision.get("*")}))
+    return [page for _, page in sorted(ret, key=lambda r: r[0])]
+
+
+def get_revisions_for_pages(titles: List[str]):
+    """Get the id and timestamp of the current revision of up to 50 pages.
+    This always makes a request to IMSLP, because the response changes each time a page is edited.
+
+    Returns:
+        a dict of page title -> {"revid": revision id, "timestamp": time of the revision}
+    """
+    if len(titles) > 50:
+        raise ValueError("can only do up to 50 pages")
+
+    params = {
+        "action": "query",
+        "prop": "revisions",
+        "titles": "|".join(titles),
+        "rvprop": "ids|timestamp",
+        "formatversion": "2",
+        "format": "json"
+    }
+    url = 'https://imslp.org/api.php'
+
+    r = get_uncached_session().get(url, params=params)
+    r.raise_for_status()
+    j = r.json()
+
+    ret = {}
+    for pageid, page in j.get("query", {}).get("pages", {}).items():
+        revisions = page.get("revisions")
+        if revisions:
+            ret[page["title"]] = {"revid": revisions[0]["revid"], "timestamp": revisions[0].get("timestamp")}
     return ret
 
 
-def api_all_pages():
-    """Get a list of all composition pages in IMSLP, including the category which represents the work's composer"""
+def iter_wiki_content_for_pages(titles: List[str], workers=1):
+    """Load the wikitext of any number of titles, 50 at a time.
+
+    Arguments:
+        titles: a list of page titles
+        workers: the number of chunks to request at the same time
+
+    Returns:
+        a generator of lists of pages, one for each chunk of 50 titles, in the same order as `titles`
+    """
+    return map_in_order("imslp.org", get_wiki_content_for_pages, chunks(titles, 50), workers)
+
+
+# File that api_all_pages writes the IMSLP worklist to
+ALL_PAGES_DUMP = "all-imslp-pages.json"
+
+
+def _is_ndjson(path):
+    return path.endswith(".ndjson") or path.endswith(".jsonl")
+
+
+def api_all_pages(path=ALL_PAGES_DUMP):
+    """Get a list of all composition pages in IMSLP, including the category which represents the work's composer
+
+    The list is written to `path`. If it ends in .ndjson or .jsonl, each page is written on its own line
+    as soon as it's loaded, otherwise the file is a single json list. The pages are written to a temporary
+    file which replaces `path` once all pages are loaded, so an existing dump is kept if loading fails"""
     base_url = "https://imslp.org/imslpscripts/API.ISCR.php?account=worklist/disclaimer=accepted/sort=id/type=2/start={}/retformat=json"
+    ndjson = _is_ndjson(path)
     hasnext = True
     start = 0
     alldata = []
-    while hasnext:
-        url = base_url.format(start)
-        r = session.get(url)
-        j = r.json()
-        metadata = j.get('metadata', {})
-        if metadata:
-            hasnext = metadata.get('moreresultsavailable', False)
-        for i in range(1000):
-            data = j.get(str(i))
-            if data:
-                alldata.append(data)
-        start += 1000
-    with open("all-imslp-pages.json", "w") as fp:
-        json.dump(alldata, fp)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as fp:
+        while hasnext:
+            url = base_url.format(start)
+            r = get_session().get(url)
+            j = r.json()
+            metadata = j.get('metadata', {})
+            if metadata:
+                hasnext = metadata.get('moreresultsavailable', False)
+            for i in range(1000):
+                data = j.get(str(i))
+                if data and ndjson:
+                    fp.write(json.dumps(data) + "\n")
+                elif data:
+                    alldata.append(data)
+            start += 1000
+        if not ndjson:
+            json.dump(alldata, fp)
+    os.replace(tmp_path, path)
+
+
+def iter_all_pages_dump(path):
+    """Read the pages in a file written by `api_all_pages`. An .ndjson or .jsonl file is read one line at a time"""
+    with open(path) as fp:
+        if _is_ndjson(path):
+            for line in fp:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(fp)
+
+
+def load_all_pages_dump(path, titles=None):
+    """Load the pages in a file written by `api_all_pages` into a dict of page title -> page.
+
+    Arguments:
+        path: the file to read
+        titles: if set, only keep pages with these titles
+    """
+    if titles is not None:
+        titles = {t.replace("_", " ") for t in titles}
+    pages = {}
+    for page in iter_all_pages_dump(path):
+        title = page.get("id", "").replace("_", " ")
+        if titles is None or title in titles:
+            pages[title] = page
+    return pages
 
 
 def parse_imslp_date(year, month, day):
@@ -187,11 +410,13 @@ def parse_imslp_date(year, month, day):
             return None
 
 
-def imslp_api_raw_query(page_name):
-    """Use the custom IMSLP API to get some parsed metadata for a page"""
+def imslp_api_raw_query(page_name, cached=True):
+    """Use the custom IMSLP API to get some parsed metadata for a page.
+    If `cached` is False, always load it from IMSLP instead of using a cached response"""
     page_id = base64.b64encode(urllib.parse.quote(page_name).encode("utf-8"))
     page_id = page_id.decode('utf-8')
     url = f"https://imslp.org/imslpscripts/API.ISCR.php?retformat=json/disclaimer=accepted/type=0/id={page_id}"
+    session = get_session() if cached else get_uncached_session()
     r = session.get(url)
     try:
         return r.json()
@@ -275,21 +500,25 @@ def api_composer(composer_name):
         return {}
 
 
-def api_work(work_name):
+def api_work(work_name, dump_page=None, page=None):
     """Load a work from IMSLP and return a dict adequate to load MusicComposition into CE
 
     There are two places where we can get metadata from:
        - one is the wikitext of the page
        - the other is the IMSLP API for a page, given the base64 of a title
        https://imslp.org/imslpscripts/API.ISCR.php?retformat=json/disclaimer=accepted/type=0/id=VmFyaWF0aW9ucyBhbmQgRnVndWUgaW4gRS1mbGF0IG1ham9yLCBPcC4zNSAoQmVldGhvdmVuLCBMdWR3aWcgdmFuKQ==
+
+    If `dump_page` (the page from the dump written by `api_all_pages`) is set, the composer is read
+    from it. The other metadata still comes from the IMSLP API, because the dump doesn't include it.
+    If `page` (a WorkPage) is set, resources of the page that it already loaded aren't loaded again.
     """
 
-    url = "https://imslp.org/wiki/" + work_name.replace(" ", "_")
-    html_page = read_source(url)
-    api_page = imslp_api_raw_query(work_name.replace("_", " "))
-    api_page = api_page.get('0', {})
-    wikitext = get_wiki_content_for_pages([work_name])
-    parsed = mwph.parse(wikitext[0]["content"])
+    if page is None:
+        page = WorkPage(work_name, dump_page=dump_page)
+    url = page.url
+    html_page = page.html
+    api_page = page.api_page
+    parsed = page.parsed
     musicbrainz_work_id = None
     templates = parsed.filter_templates()
     for t in templates:
@@ -304,7 +533,7 @@ def api_work(work_name):
                         'catalan': 'ca'}
 
     if html_page is not None:
-        title = get_page_title(url)
+        title = page.title
 
         inlanguage = None
         language = api_page.get('extvals', {}).get('Language')
@@ -314,7 +543,7 @@ def api_work(work_name):
                 print(f"No mapping for language {language}")
 
         name = api_page.get('extvals', {}).get('Work Title')
-        composer = api_page.get('parent')
+        composer = page.composer
 
         work_dict = {
             'title': title,
@@ -334,17 +563,20 @@ def api_work(work_name):
             "musicbrainz_work_id": musicbrainz_work_id}
 
 
-def get_mediaobject_for_filename(work_wikitext, filename):
+def get_mediaobject_for_filename(work_wikitext, filename, parsed=None, page=None):
     """
     If we have a specific file that we want to import (looked up from a Special:ReverseLookup)
     then find that file in the provided wikitext and return information to create a MediaObject
+    If `parsed` (the result of parse_wikitext on the wikitext) is set, the wikitext isn't parsed again.
+    If `page` (the WorkPage of the work) is set, its html is used to find the file's permalink
     TODO: This shares a lot of common code with `files_for_work`
     """
     # Filename doesn't include File: prefix in the template
     if filename.startswith("File:"):
         filename = filename.replace("File:", "")
 
-    parsed = mwph.parse(work_wikitext["content"])
+    if parsed is None:
+        parsed = parse_wikitext(work_wikitext["content"])
     # A page should have one node, the #fte:imslppage template
     nodes = parsed.nodes
     if not nodes or str(nodes[0].name).strip() != "#fte:imslppage":
@@ -385,9 +617,10 @@ def get_mediaobject_for_filename(work_wikitext, filename):
             this_desc = node_to_dict[f"File Description {file_index}"]
 
             this_file = "File:" + this_file
-            permalink = get_permalink_from_filename(title, this_file.replace("_", " "))
-            file_url = "http://imslp.org/wiki/" + this_file
-            file_title = get_page_title(file_url)
+            file_name = this_file.replace("_", " ")
+            resolved = resolve_files(page or WorkPage(work_wikitext["title"]), [file_name])[file_name]
+            permalink = resolved["url"]
+            file_title = resolved["title"]
 
             # TODO: Person who published, transcribed work. Date of publication on imslp?
             file_dict = {
@@ -405,15 +638,18 @@ def get_mediaobject_for_filename(work_wikitext, filename):
     return {}
 
 
-def files_for_work(work_wikitext):
+def files_for_work(work_wikitext, parsed=None, page=None):
     """Get MediaObject information for files relevant to the work
 
     If the work has an xml file, get the xml and the pdf associated with it
 
     Arguments:
         work_wikitext: the result of get_wiki_content_for_pages of a work
+        parsed: if set, the result of parse_wikitext on the wikitext, so that it isn't parsed again
+        page: if set, the WorkPage of the work, whose html is used to find the permalinks of files
     """
-    parsed = mwph.parse(work_wikitext["content"])
+    if parsed is None:
+        parsed = parse_wikitext(work_wikitext["content"])
 
     # A page should have one node, the #fte:imslppage template
     nodes = parsed.nodes
@@ -469,6 +705,10 @@ def files_for_work(work_wikitext):
         title = work_wikitext["title"].replace(" ", "_")
         url = "http://imslp.org/wiki/" + title
 
+        # Find the titles and permalinks of all files at once
+        file_names = ["File:" + node_to_dict[f"File Name {i}"].replace("_", " ") for i in range(1, num_files+1)]
+        resolved = resolve_files(page or WorkPage(work_wikitext["title"]), file_names)
+
         for i in range(1, num_files+1):
             this_file = node_to_dict[f"File Name {i}"]
             this_desc = node_to_dict[f"File Description {i}"]
@@ -477,9 +717,8 @@ def files_for_work(work_wikitext):
 
             this_file = "File:" + this_file
             # TODO: This isn't a great way of going back and forth between filenames
-            permalink = get_permalink_from_filename(title, this_file.replace("_", " "))
-            file_url = "http://imslp.org/wiki/" + this_file
-            file_title = get_page_title(file_url)
+            permalink = resolved[this_file.replace("_", " ")]["url"]
+            file_title = resolved[this_file.replace("_", " ")]["title"]
 
             # TODO: Person who published, transcribed work. Date of publication on imslp?
             file_dict = {
@@ -513,7 +752,7 @@ def get_composition_and_filename_from_permalink(permalink):
     # We don't use read_source because we need the response object to get the URL from
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36'}
-    r = session.get(permalink, headers=headers)
+    r = get_session().get(permalink, headers=headers)
     redirected_url = r.url
     page_name = redirected_url.replace("https://imslp.org/wiki/", "")
 
@@ -525,6 +764,85 @@ def get_composition_and_filename_from_permalink(permalink):
     return page_name, file_href
 
 
+def display_title_text(display_title):
+    """The api returns display titles as html (e.g. & is &amp;). Remove any tags and
+    entities, giving the text as it's shown in the <title> of the page"""
+    return html.unescape(re.sub(r"<[^>]*>", "", display_title))
+
+
+def get_display_titles(titles: List[str]):
+    """Get the display title of up to 50 pages, as shown in the <title> of their html pages
+    (without the name of the site)
+
+    Returns:
+        a dict of title (as given in `titles`) -> display title
+    """
+    if len(titles) > 50:
+        raise ValueError("can only do up to 50 pages")
+
+    params = {
+        "action": "query",
+        "prop": "info",
+        "inprop": "displaytitle",
+        "titles": "|".join(titles),
+        "format": "json"
+    }
+    url = 'https://imslp.org/api.php'
+
+    r = get_session().get(url, params=params)
+    r.raise_for_status()
+    query = r.json().get("query", {})
+
+    normalized = {n["to"]: n["from"] for n in query.get("normalized", [])}
+    ret = {}
+    for page in query.get("pages", {}).values():
+        title = page["title"]
+        ret[normalized.get(title, title)] = display_title_text(page.get("displaytitle", title))
+    return ret
+
+
+def resolve_files(page, filenames):
+    """Find the title and ReverseLookup permalink of some files of a work.
+
+    The permalinks are all read from a single parse of the html of the work page, and the titles
+    are loaded for 50 files at a time from the mediawiki api, instead of loading the page of each file.
+    The html <title> of a page is its display title followed by the name of the site, which we find
+    by comparing the <title> of the work page to its display title. If that isn't possible, the
+    title is read from the html of the file page.
+
+    Arguments:
+        page: the WorkPage of the work
+        filenames: file page names, including File: (e.g. File:PMLP05827-Op.35.pdf)
+
+    Returns:
+        a dict of filename -> {"title": <title> of the file page, "url": permalink of the file}
+    """
+    if page.soup is None:
+        raise ValueError(f"Cannot load the html page of {page.url}")
+    links = {a["title"]: a.text for a in page.soup.find_all("a", title=True)}
+
+    display_titles = {}
+    for titles in chunks([page.work_name] + list(filenames), 50):
+        display_titles.update(get_display_titles(titles))
+
+    site_suffix = None
+    work_display_title = display_titles.get(page.work_name)
+    if page.title and work_display_title and page.title.startswith(work_display_title):
+        site_suffix = page.title[len(work_display_title):]
+
+    ret = {}
+    for filename in filenames:
+        if filename not in links:
+            raise ValueError(f"Cannot find a link to {filename} on {page.url}")
+        permalink = "https://imslp.org/wiki/Special:ReverseLookup/" + links[filename].replace("#", "")
+        if site_suffix is not None and filename in display_titles:
+            title = display_titles[filename] + site_suffix
+        else:
+            title = get_page_title("http://imslp.org/wiki/" + filename.replace(" ", "_"))
+        ret[filename] = {"title": title, "url": permalink}
+    return ret
+
+
 def get_permalink_from_filename(wikipage, filename):
     """Given a wiki page title and a filename
     (e.g. Variations_and_Fugue_in_E-flat_major,_Op.35_(Beethoven,_Ludwig_van), File:PMLP05827-Op.35.pdf)
@@ -539,7 +857,7 @@ def get_permalink_from_filename(wikipage, filename):
     # We don't use read_source because we need the response object to get the URL from
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36'}
-    r = session.get(url, headers=headers)
+    r = get_session().get(url, headers=headers)
     bs = BeautifulSoup(r.text, features="lxml")
     text = bs.find("a", {"title": filename}).text
     text = text.replace("#", "")
@@ -570,43 +888,72 @@ def get_score():
     pass
 
 
-def filter_works_for_xml(work_names):
-    """Given a list of work names, bulk load them an only return those which have an xml
-    file attached to them (File Description contains "XML") """
+def iter_works_for_xml(work_names, workers=1):
+    """Given a list of work names, bulk load them and yield the names of those which have an xml
+    file attached to them (File Description contains "XML") as soon as each chunk of 50 works is loaded
 
+    Arguments:
+        work_names: a list of work page names
+        workers: the number of chunks to load at the same time. These are loaded in the background,
+                 so with 1 the next chunk is loaded while the current one is checked
+    """
     total_works = len(work_names)
     current_works = 0
-    all_xml_works = []
-    for pages in chunks(work_names, 50):
-        current_works += len(pages)
+    for work_pages in iter_wiki_content_for_pages(work_names, workers):
+        current_works += min(50, total_works - current_works)
         print("{}/{}".format(current_works, total_works), file=sys.stderr)
-        work_pages = get_wiki_content_for_pages(pages)
-        xml_work_pages = [w['title'] for w in work_pages if page_has_mxml(w)]
-        all_xml_works.extend(xml_work_pages)
-    return all_xml_works
+        for w in work_pages:
+            if page_has_mxml(w):
+                yield w['title']
 
 
-def get_composers_for_works(work_names):
+def filter_works_for_xml(work_names):
+    """Given a list of work names, bulk load them an only return those which have an xml
+    file attached to them (File Description contains "XML") """
+    return list(iter_works_for_xml(work_names))
+
+
+def get_composers_for_works(work_names, dump=None):
     """Given a list of works, get a unique list of composers for each of them.
 
-    Requires an individual lookup for each work name
+    Requires an individual lookup for each work name, unless it's in `dump`
+    (the result of `load_all_pages_dump`)
     """
     total_works = len(work_names)
     composers = set()
 
     for index, work_name in enumerate(work_names, 1):
         print("{}/{}".format(index, total_works), file=sys.stderr)
-        page_contents = imslp_api_raw_query(work_name)
-        page = page_contents.get('0')
+        page = (dump or {}).get(work_name.replace("_", " "))
+        if page is None:
+            page_contents = imslp_api_raw_query(work_name)
+            page = page_contents.get('0')
         if page:
             composers.add(page['parent'])
     return sorted(list(composers))
 
 
+def _may_have_xml_file_description(content):
+    """True if "XML" comes somewhere after the first `File Description` parameter name in `content`.
+
+    A description can contain nested templates and links over many lines, so the end of its value
+    can't be found without parsing it. But every page with an XML file has "XML" after the name,
+    so a page which doesn't can't have one. Other pages can match too (e.g. if "XML" is in a later
+    parameter), and these need to be parsed to check them.
+    """
+    start = content.find("File Description")
+    return start != -1 and content.find("XML", start) != -1
+
+
 def page_has_mxml(work):
     """Take a page from `get_wiki_content_for_pages` and see if the mediawiki
     text contains an XML file"""
-    parsed = mwph.parse(work["content"])
+    content = work["content"]
+    # Parsing the wikitext is slow, so first reject pages which can't have a file description that
+    # mentions XML, and only parse the ones which might have one
+    if not _may_have_xml_file_description(content):
+        return False
+    parsed = parse_wikitext(content)
     templates = parsed.filter_templates()
     if len(templates):
         # The first template is `#fte:imslppage`, and this contains many parameters.
@@ -712,6 +1059,5 @@ Wikitext for an imslp page
 | *****COMMENTS***** =
 
 
-
 | *****END OF TEMPLATE***** }}
 """
\ No newline at end of file
@@ -1,14 +1,11 @@
-import requests_cache
 from musicbrainzngs import musicbrainz as mb
-from requests.adapters import HTTPAdapter
-
-mb.set_useragent('trompa', '0.1')
 
+from ceimport.ratelimit import limiter
+from ceimport.session import get_session
 
-session = requests_cache.CachedSession()
-adapter = HTTPAdapter(max_retries=5)
-session.mount("https://", adapter)
-session.mount("http://", adapter)
+mb.set_useragent('trompa', '0.1')
+# Requests made through musicbrainzngs use the shared rate limiter instead of its own global one
+mb.set_rate_limit(False)
 
 
 VIAF_REL = 'e8571dcc-35d4-4e91-a577-a3382fd84460'
@@ -21,10 +18,16 @@ COMPOSER_REL = 'd59d99ea-23d4-4a80-b066-edca32ee158f'
 PARTS_REL = 'ca8d3642-ce5f-49f8-91f2-125d72524e6a'
 
 
+def _mb_request(function, *args, **kwargs):
+    """Call a musicbrainzngs function once the musicbrainz.org rate limit allows it"""
+    limiter.acquire("musicbrainz.org")
+    return function(*args, **kwargs)
+
+
 def get_artist_from_musicbrainz(artist_mbid):
     """
     """
-    artist = mb.get_artist_by_id(artist_mbid, includes=['artist-rels'])['artist']
+    artist = _mb_request(mb.get_artist_by_id, artist_mbid, includes=['artist-rels'])['artist']
 
     return artist
 
@@ -51,7 +54,7 @@ def load_group_from_musicbrainz(artist):
     for relation in artist_relations:
         if relation['type-id'] == '5be4c609-9afa-4ea0-910b-12ffb71e3821':
             member = relation.get('artist', {})
-            member = mb.get_artist_by_id(member['id'])['artist']
+            member = _mb_request(mb.get_artist_by_id, member['id'])['artist']
             mb_person = load_person_from_musicbrainz(member)
             members.append(mb_person)
 
@@ -115,7 +118,7 @@ def load_person_from_musicbrainz(artist):
 def load_person_relations_from_musicbrainz(artist_mbid):
     # TODO: Don't do this request twice
 
-    artist = mb.get_artist_by_id(artist_mbid, includes=['url-rels'])['artist']
+    artist = _mb_request(mb.get_artist_by_id, artist_mbid, includes=['url-rels'])['artist']
     isnis = artist.get('isni-list', [])
 
     external_relations = {}
@@ -142,7 +145,7 @@ def load_person_relations_from_musicbrainz(artist_mbid):
 
 
 def load_work_from_musicbrainz(work_mbid):
-    work = mb.get_work_by_id(work_mbid, includes=["artist-rels", "work-rels"])['work']
+    work = _mb_request(mb.get_work_by_id, work_mbid, includes=["artist-rels", "work-rels"])['work']
 
     title = work['title']
     work_dict = {
@@ -195,7 +198,7 @@ def load_work_from_musicbrainz(work_mbid):
 
 
 def load_area_from_musicbrainz(area_id):
-    area = mb.get_area_by_id(area_id)['area']
+    area = _mb_request(mb.get_area_by_id, area_id)['area']
     name = area['name']
     return {
         # This is the title of the page, so it includes the header
@@ -224,7 +227,7 @@ def _lookup_imslp_url(url, includes, parse_callback):
     params = {"fmt": "json", "resource": url,
               "inc": includes}
     headers = {"User-Agent": "trompa importer"}
-    r = session.get("https://musicbrainz.org/ws/2/url", params=params, headers=headers)
+    r = get_session().get("https://musicbrainz.org/ws/2/url", params=params, headers=headers)
     if r.status_code == 200:
         return parse_callback(r.json())
     else:
@@ -1,18 +1,12 @@
 import requests
-import requests_cache
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
 
-
-session = requests_cache.CachedSession()
-adapter = HTTPAdapter(max_retries=5)
-session.mount("https://", adapter)
-session.mount("http://", adapter)
+from ceimport.session import get_session
 
 
 def load_person_from_viaf(viaf_url):
     try:
-        r = session.get(viaf_url)
+        r = get_session().get(viaf_url)
         r.raise_for_status()
         bs = BeautifulSoup(r.content, features="lxml")
         title = bs.find("title")
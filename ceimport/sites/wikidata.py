@@ -1,15 +1,9 @@
-import requests_cache
 import wikipedia
 from wikipedia.exceptions import DisambiguationError, PageError
 from wikidata.client import Client
 from urllib.parse import urlparse
 
-from requests.adapters import HTTPAdapter
-
-session = requests_cache.CachedSession()
-adapter = HTTPAdapter(max_retries=5)
-session.mount("https://", adapter)
-session.mount("http://", adapter)
+from ceimport.session import get_session
 
 
 class WikipediaException(Exception):
@@ -127,7 +121,7 @@ def get_wikidata_id_from_wikipedia_url(wp_url):
     wp_title = "/".join(parts[2:])
     param_url = "https://en.wikipedia.org/w/api.php?action=query&prop=pageprops&titles={}&format=json"
     full_url = param_url.format(wp_title)
-    r = session.get(full_url)
+    r = get_session().get(full_url)
     data = r.json()
     title = _get_normalized_query(data, wp_title)
     pages = data.get("query", {}).get("pages")
@@ -151,7 +145,7 @@ def get_description_from_wikipedia(title):
     desc_url = "https://en.wikipedia.org/w/api.php?action=query&prop=extracts&exintro=1&format=json&redirects=1&titles={}"
     full_url = desc_url.format(title)
 
-    r = session.get(full_url)
+    r = get_session().get(full_url)
     data = r.json()
     return parse_description_from_wikipedia_response(title, data)
 
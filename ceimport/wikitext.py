@@ -0,0 +1,74 @@
+import hashlib
+import threading
+
+import mwparserfromhell as mwph
+
+from ceimport.cache import LRUCache
+
+# Number of parsed pages to keep. When a category is imported, each page is parsed by a number of
+# different functions soon after it is loaded, so the cache only needs to hold the pages that are
+# being worked on at the same time
+PARSE_CACHE_SIZE = 1000
+
+
+class ParseCache:
+    """A bounded cache of parsed mwparserfromhell trees, keyed by a hash of the wikitext that they were parsed from.
+
+    The same page is parsed by many functions (e.g. to find its composer, and then again to find its files).
+    With this cache the wikitext of a page is only parsed once, as long as it is still in the cache.
+    Once there are more than `maxsize` items, the least recently used one is removed.
+    Trees in the cache are shared between all callers, so they must not be modified.
+    The cache can be shared between threads.
+    """
+
+    def __init__(self, maxsize=PARSE_CACHE_SIZE):
+        self.hits = 0
+        self.misses = 0
+        self._items = LRUCache(maxsize)
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        return self._items.maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        with self._lock:
+            self._items.maxsize = maxsize
+
+    def parse(self, content):
+        """Parse `content`, returning a cached tree if the same content was parsed before"""
+        if not self.maxsize:
+            return mwph.parse(content)
+        key = hashlib.sha1(content.encode("utf-8")).digest()
+        with self._lock:
+            if key in self._items:
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+
+        # Parsing is slow, so don't hold the lock while doing it. If two threads parse the same
+        # content at the same time, one of the trees is kept
+        parsed = mwph.parse(content)
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = parsed
+            return self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+parse_cache = ParseCache()
+
+
+def parse_wikitext(content):
+    """Parse wikitext with mwparserfromhell, using the shared cache"""
+    return parse_cache.parse(content)
@@ -0,0 +1,93 @@
+import collections
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ceimport import logger
+
+# Maximum number of tasks that can make requests to a host at the same time.
+# Hosts that aren't listed here use DEFAULT_HOST_CONCURRENCY
+HOST_CONCURRENCY = {
+    "musicbrainz.org": 1,
+    "imslp.org": 2,
+    "cpdl.org": 2,
+}
+DEFAULT_HOST_CONCURRENCY = 4
+
+# Number of threads used to run tasks
+MAX_WORKERS = 8
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def host_semaphore(host):
+    """Get the semaphore which limits concurrent access to `host`"""
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            limit = HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY)
+            _host_semaphores[host] = threading.BoundedSemaphore(limit)
+        return _host_semaphores[host]
+
+
+def _run_task(host, function, args):
+    with host_semaphore(host):
+        return function(*args)
+
+
+def run_concurrently(tasks, max_workers=MAX_WORKERS):
+    """Run a list of independent tasks on a thread pool
+
+    Arguments:
+        tasks: a list of (host, function, args) tuples. `host` is the host that `function`
+               makes requests to, and is used to limit how many tasks access it at once
+        max_workers: the number of threads to use
+
+    Returns:
+        a list of the return values of each task, in the same order as `tasks`.
+        If a task raises an exception it is raised here
+    """
+    if not tasks:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        futures = [executor.submit(_run_task, host, function, args) for host, function, args in tasks]
+        return [f.result() for f in futures]
+
+
+def run_pool(function, items, max_workers):
+    """Call `function` with each item in `items` on a pool of `max_workers` threads.
+
+    Unlike `run_concurrently`, a failure of one item doesn't stop the others. Failures are logged,
+    and the items that failed are returned.
+    """
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(function, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Failed to import %s", item)
+                failed.append(item)
+    return failed
+
+
+def map_in_order(host, function, items, max_workers=MAX_WORKERS):
+    """Like map(function, items), but up to `max_workers` calls are running at once.
+    Results are yielded in the same order as `items` as soon as they are available,
+    and only `max_workers` items are read from `items` ahead of the result being used.
+
+    Arguments:
+        host: the host that `function` makes requests to, and is used to limit how many calls access it at once
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = collections.deque()
+        for item in itertools.islice(items, max(1, max_workers)):
+            pending.append(executor.submit(_run_task, host, function, (item,)))
+        while pending:
+            result = pending.popleft().result()
+            for item in itertools.islice(items, 1):
+                pending.append(executor.submit(_run_task, host, function, (item,)))
+            yield result
@@ -10,11 +10,15 @@ import os
 import sys
 import argparse
 import asyncio
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 import trompace as ce
 from trompace.config import config
 
-from muziekweb_api import set_api_account
-from importers import import_artist, import_album, import_tracks
+from muziekweb_api import performer_cache, set_api_account
+from importers import import_artist, import_album, import_album_tracks, import_tracks
+from trompace_local import close_session, content_hashes
 from dotenv import load_dotenv
 
 
@@ -37,6 +41,17 @@ main_parser.add_argument("-cep", dest="ce_pass", required=False, help="Trompa CE
 # Muziekweb API
 main_parser.add_argument("-mwu", dest="mw_api_user", required=False, help="The username for the Muziekweb API.")
 main_parser.add_argument("-mwp", dest="mw_api_pass", required=False, help="The password for the Muziekweb API.")
+# Concurrency
+main_parser.add_argument("-c", dest="concurrency", required=False, type=int, default=4,
+                         help="Number of tracks to import at the same time.")
+main_parser.add_argument("-album", dest="by_album", required=False, action="store_true",
+                         help="Import the requested tracks of each album together, loading the album information once.")
+main_parser.add_argument("-pf", dest="performer_file", required=False, default="muziekweb-performers.json",
+                         help="File to cache information about performers in between imports.")
+# Change detection
+main_parser.add_argument("-hf", dest="hash_file", required=False, default="muziekweb-hashes.json",
+                         help="File to store the content hash of each object imported into the Trompa CE. "
+                              "Objects that didn't change since the last import are not updated.")
 
 
 # Startup defaults or parameterized values
@@ -56,6 +71,79 @@ mw_api_user = mw_api_user if args.mw_api_user is None else args.mw_api_user
 mw_api_pass = mw_api_pass if args.mw_api_pass is None else args.mw_api_pass
 
 
+async def import_track_list(tracks: [str], concurrency: int, by_album: bool = False):
+    """
+    Import a list of tracks in a single event loop, importing up to `concurrency` tracks at the same time.
+    If `by_album` is set, the tracks of each album are imported together from one album document,
+    and up to `concurrency` albums are imported at the same time.
+    """
+    # Each track loads its data from Muziekweb in a thread, so allow one thread per track being imported
+    asyncio.get_event_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = []
+    completed = 0
+    saved = 0
+
+    def track_done(count: int):
+        nonlocal completed, saved
+        completed += count
+        if completed - saved >= HASH_SAVE_INTERVAL:
+            content_hashes.save()
+            performer_cache.save()
+            saved = completed
+
+    async def import_track(track: str):
+        async with semaphore:
+            try:
+                await import_tracks(track)
+            except Exception:
+                traceback.print_exc()
+                failed.append(track)
+                print('Import track {} FAILED'.format(track))
+            else:
+                print('Import track {} COMPLETED'.format(track))
+            print('--------------------------------------\n')
+            track_done(1)
+
+    async def import_tracks_of_album(album: str, album_tracks: [str]):
+        async with semaphore:
+            try:
+                album_failed = await import_album_tracks(album, album_tracks)
+            except Exception:
+                traceback.print_exc()
+                album_failed = album_tracks
+            failed.extend(album_failed)
+            print('Import album {} COMPLETED, {} of {} tracks failed'.format(
+                album, len(album_failed), len(album_tracks)))
+            print('--------------------------------------\n')
+            track_done(len(album_tracks))
+
+    start = time.monotonic()
+    try:
+        if by_album:
+            albums = {}
+            for track in tracks:
+                albums.setdefault(track.split('-')[0], []).append(track)
+            await asyncio.gather(*[import_tracks_of_album(album, album_tracks)
+                                   for album, album_tracks in albums.items()])
+        else:
+            await asyncio.gather(*[import_track(track) for track in tracks])
+    finally:
+        await close_session()
+        content_hashes.save()
+        performer_cache.save()
+    elapsed = time.monotonic() - start
+
+    print(f"Imported {len(tracks) - len(failed)} of {len(tracks)} tracks in {elapsed:.1f}s "
+          f"({len(tracks) / elapsed:.2f} tracks/s)")
+    for track in failed:
+        print(f"  failed: {track}")
+
+
+# Save the content hashes and performer cache after this many tracks, so that little is lost if an import stops
+HASH_SAVE_INTERVAL = 100
+
+
 def readKeys(input: str) -> [str]:
     if os.path.isfile(input):
         with open(input, "r") as f:
@@ -84,26 +172,26 @@ if __name__ == "__main__":
     if mw_api_user is not None and mw_api_pass is not None:
         set_api_account(mw_api_user, mw_api_pass)
 
+    # Load the hashes of objects imported before
+    content_hashes.load(args.hash_file)
+    performer_cache.load(args.performer_file)
+
     tracks = readKeys(source_track)
-    for track in tracks:
-        # Import Muziekweb artists into the Trompa CE
-        # asyncio for python >= 3.8
-        if sys.version_info[0] == 3 and sys.version_info[1] >= 8:
-            # if source_artist is not None:
-            #     asyncio.run(import_artist(source_artist))
-            # elif source_release is not None:
-            #     asyncio.run(import_album(source_release))
-            # elif source_track is not None:
-            asyncio.run(import_tracks(track))
-        else:
-            # asyncio for python < 3.7
-            loop = asyncio.get_event_loop()
-            # if source_artist is not None:
-            #     result = loop.run_until_complete(import_artist(source_artist))
-            # elif source_release is not None:
-            #     result = loop.run_until_complete(import_album(source_release))
-            # elif source_track is not None:
-            result = loop.run_until_complete(import_tracks(track))
-
-        print('Import track {} COMPLETED'.format(track))
-        print('--------------------------------------\n')
\ No newline at end of file
+    # Import Muziekweb tracks into the Trompa CE
+    # asyncio for python >= 3.8
+    if sys.version_info[0] == 3 and sys.version_info[1] >= 8:
+        # if source_artist is not None:
+        #     asyncio.run(import_artist(source_artist))
+        # elif source_release is not None:
+        #     asyncio.run(import_album(source_release))
+        # elif source_track is not None:
+        asyncio.run(import_track_list(tracks, args.concurrency, args.by_album))
+    else:
+        # asyncio for python < 3.7
+        loop = asyncio.get_event_loop()
+        # if source_artist is not None:
+        #     result = loop.run_until_complete(import_artist(source_artist))
+        # elif source_release is not None:
+        #     result = loop.run_until_complete(import_album(source_release))
+        # elif source_track is not None:
+        result = loop.run_until_complete(import_track_list(tracks, args.concurrency, args.by_album))
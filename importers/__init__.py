@@ -2,5 +2,5 @@
 Import per data type
 """
 from .artist import import_artist
-from .audio_object import import_tracks
+from .audio_object import import_album_tracks, import_tracks
 from .music_album import import_album
@@ -3,13 +3,12 @@ Muziekweb artist importer
 """
 from typing import Optional
 
-import trompace as ce
 from SPARQLWrapper import SPARQLWrapper, JSON
-from trompace.connection import submit_query
 from trompace.mutations.person import mutation_update_person, mutation_create_person
 
 from models import CE_Person
-from trompace_local import GLOBAL_CONTRIBUTOR, GLOBAL_IMPORTER_REPO, GLOBAL_PUBLISHER, lookupIdentifier
+from trompace_local import GLOBAL_CONTRIBUTOR, GLOBAL_IMPORTER_REPO, GLOBAL_PUBLISHER, lookupIdentifier, \
+    submit_query_async
 
 
 async def import_artist(keys: list):
@@ -29,11 +28,11 @@ async def import_artist(keys: list):
 
         if artist.identifier is not None:
             print(f"Updating record {artist.identifier} in Trompa CE", end="")
-            response = await ce.connection.submit_query(mutation_update_person(**artist.as_dict()))
+            response = await submit_query_async(mutation_update_person(**artist.as_dict()))
             artist.identifier = response["data"]["UpdatePerson"]["identifier"]
         else:
             print("Inserting new record in Trompa CE", end="")
-            response = await ce.connection.submit_query(mutation_create_person(**artist.as_dict()))
+            response = await submit_query_async(mutation_create_person(**artist.as_dict()))
             artist.identifier = response["data"]["CreatePerson"]["identifier"]
 
         if artist.identifier is None:
@@ -1,10 +1,11 @@
 """
 Muziekweb music fragment importer
 """
+import asyncio
+import collections
 import itertools
+import traceback
 
-import trompace as ce
-from trompace.connection import submit_query
 from trompace.mutations.audioobject import mutation_update_audioobject, mutation_create_audioobject, \
     mutation_merge_audioobject_exampleofwork
 from trompace.mutations.musiccomposition import mutation_update_music_composition, mutation_create_music_composition, \
@@ -23,43 +24,93 @@ from ceimport.sites import musicbrainz
 from ceimport.sites.viaf import load_person_from_viaf
 from ceimport.sites.wikidata import load_person_from_wikidata_url, load_person_from_wikipedia_url
 from models import CE_AudioObject, CE_Person, CE_MusicComposition, CE_MusicGroup, CE_MusicRecording
-from muziekweb_api import get_album_information, get_artist_information
-from trompace_local import GLOBAL_CONTRIBUTOR, GLOBAL_IMPORTER_REPO, GLOBAL_PUBLISHER, lookupIdentifier
+from muziekweb_api import get_album_information, get_performer_information, performer_cache
+from trompace_local import GLOBAL_CONTRIBUTOR, GLOBAL_IMPORTER_REPO, GLOBAL_PUBLISHER, lookupIdentifier, \
+    content_hashes, submit_query_async
 
 MW_AUDIO_URL = "https://www.muziekweb.nl/Embed/{}"
 MW_MUSIC_URL = "https://www.muziekweb.nl/en/Link/{}/{}/{}"
 
+# Identifiers of objects written to the CE by tracks that are imported in this run, by (dataType, source).
+# Tracks that are imported at the same time often share works and performers. Only one track
+# writes an object at a time, and the others use the identifier that it wrote.
+_written = {}
+_write_locks = collections.defaultdict(asyncio.Lock)
+
 
 async def import_tracks(key: str):
     """
     Imports audio fragments from Muziekweb for the key into the Trompa CE.
     """
     print(f"Retrieving release info with key {key} from Muziekweb")
-    # Get data from Muziekweb
-    audio_objects, music_recordings, music_works, persons, music_groups = get_mw_audio_1track(key)
+    # Get data from Muziekweb. This makes blocking requests to Muziekweb and other sites, so run it in a thread
+    loop = asyncio.get_event_loop()
+    track_objects = await loop.run_in_executor(None, get_mw_audio_1track, key)
     # tracks = get_mw_audio(key)
 
+    await import_track_objects(key, *track_objects)
+
+
+async def import_album_tracks(key_album: str, keys: [str]):
+    """
+    Imports audio fragments of some tracks of an album from Muziekweb into the Trompa CE,
+    loading the album information only once. Returns the keys of tracks that failed to import.
+    """
+    print(f"Retrieving release info of album {key_album} for {len(keys)} tracks from Muziekweb")
+    loop = asyncio.get_event_loop()
+    tracks = await loop.run_in_executor(None, get_mw_audio_tracks, key_album, keys)
+
+    failed = []
+    for key in keys:
+        try:
+            await import_track_objects(key, *(tracks or {}).get(key, (None, None, None, None, None)))
+        except Exception:
+            traceback.print_exc()
+            failed.append(key)
+    return failed
+
+
+async def import_track_objects(key: str, audio_objects, music_recordings, music_works, persons, music_groups):
+    """
+    Imports the objects of a track loaded with `get_mw_audio_tracks` into the Trompa CE.
+    """
     if audio_objects is None or len(audio_objects) == 0:
         print(f"No track data received for {key}")
         return
 
+    #####################################
+    # LOOKUP
+    # Look up the identifiers of all objects of the track in the CE at the same time
+    #####################################
+    identifiers = await lookup_identifiers([("MusicComposition", work) for work in music_works] +
+                                           [("MusicRecording", recording) for recording in music_recordings] +
+                                           [("AudioObject", audio) for audio in audio_objects] +
+                                           [("Person", person) for person in persons] +
+                                           [("MusicGroup", music_group) for music_group in music_groups])
+
     #####################################
     # MUSICCOMPOSITION
     # Loop the music works to create the CE_MusicComposition on the CE
     #####################################
     for work in music_works:
 
-        work.identifier = await lookupIdentifier("MusicComposition", work.source)
+        object_key = ("MusicComposition", work.source)
+        async with _write_locks[object_key]:
+            work.identifier = _written.get(object_key, identifiers.get(object_key))
 
-        if work.identifier is not None:
-            print(f"Updating work {work.identifier} in Trompa CE\n", end="")
-            response = await ce.connection.submit_query_async(mutation_update_music_composition(**work.as_dict()))
-            work.identifier = response["data"]["UpdateMusicComposition"]["identifier"]
-        else:
-            print("Inserting new work {} in Trompa CE\n".format(work.name))
+            if work.identifier is not None and content_hashes.is_unchanged("MusicComposition", work):
+                print(f"Work {work.identifier} is unchanged in Trompa CE\n", end="")
+            elif work.identifier is not None:
+                print(f"Updating work {work.identifier} in Trompa CE\n", end="")
+                response = await submit_query_async(mutation_update_music_composition(**work.as_dict()))
+                work.identifier = response["data"]["UpdateMusicComposition"]["identifier"]
+            else:
+                print("Inserting new work {} in Trompa CE\n".format(work.name))
 
-            response = await ce.connection.submit_query_async(mutation_create_music_composition(**work.as_dict()))
-            work.identifier = response["data"]["CreateMusicComposition"]["identifier"]
+                response = await submit_query_async(mutation_create_music_composition(**work.as_dict()))
+                work.identifier = response["data"]["CreateMusicComposition"]["identifier"]
+            content_hashes.set("MusicComposition", work)
+            _written[object_key] = work.identifier
 
     print(f"Importing music composition {work.identifier} done.\n")
 
@@ -69,18 +120,24 @@ async def import_tracks(key: str):
     #####################################
     for recording in music_recordings:
 
-        recording.identifier = await lookupIdentifier("MusicRecording", recording.source)
+        object_key = ("MusicRecording", recording.source)
+        async with _write_locks[object_key]:
+            recording.identifier = _written.get(object_key, identifiers.get(object_key))
 
-        if recording.identifier is not None:
-            print(f"Updating music recording {recording.identifier} in Trompa CE\n")
+            if recording.identifier is not None and content_hashes.is_unchanged("MusicRecording", recording):
+                print(f"Music recording {recording.identifier} is unchanged in Trompa CE\n")
+            elif recording.identifier is not None:
+                print(f"Updating music recording {recording.identifier} in Trompa CE\n")
 
-            response = await ce.connection.submit_query_async(mutation_update_musicrecording(**recording.as_dict()))
-            recording.identifier = response["data"]["UpdateMusicRecording"]["identifier"]
-        else:
-            print("Inserting new recording {} in Trompa CE\n".format(recording.title))
+                response = await submit_query_async(mutation_update_musicrecording(**recording.as_dict()))
+                recording.identifier = response["data"]["UpdateMusicRecording"]["identifier"]
+            else:
+                print("Inserting new recording {} in Trompa CE\n".format(recording.title))
 
-            response = await ce.connection.submit_query_async(mutation_create_musicrecording(**recording.as_dict()))
-            recording.identifier = response["data"]["CreateMusicRecording"]["identifier"]
+                response = await submit_query_async(mutation_create_musicrecording(**recording.as_dict()))
+                recording.identifier = response["data"]["CreateMusicRecording"]["identifier"]
+            content_hashes.set("MusicRecording", recording)
+            _written[object_key] = recording.identifier
 
     print(f"Importing recordings {recording.identifier} done.\n")
 
@@ -90,18 +147,24 @@ async def import_tracks(key: str):
     #####################################
     for audio in audio_objects:
 
-        audio.identifier = await lookupIdentifier("AudioObject", audio.source)
+        object_key = ("AudioObject", audio.source)
+        async with _write_locks[object_key]:
+            audio.identifier = _written.get(object_key, identifiers.get(object_key))
 
-        if audio.identifier is not None:
-            print(f"Updating audio object {audio.identifier} in Trompa CE\n")
+            if audio.identifier is not None and content_hashes.is_unchanged("AudioObject", audio):
+                print(f"Audio object {audio.identifier} is unchanged in Trompa CE\n")
+            elif audio.identifier is not None:
+                print(f"Updating audio object {audio.identifier} in Trompa CE\n")
 
-            response = await ce.connection.submit_query_async(mutation_update_audioobject(**audio.as_dict()))
-            audio.identifier = response["data"]["UpdateAudioObject"]["identifier"]
-        else:
-            print("Inserting new audio {} in Trompa CE\n".format(audio.title))
+                response = await submit_query_async(mutation_update_audioobject(**audio.as_dict()))
+                audio.identifier = response["data"]["UpdateAudioObject"]["identifier"]
+            else:
+                print("Inserting new audio {} in Trompa CE\n".format(audio.title))
 
-            response = await ce.connection.submit_query_async(mutation_create_audioobject(**audio.as_dict()))
-            audio.identifier = response["data"]["CreateAudioObject"]["identifier"]
+                response = await submit_query_async(mutation_create_audioobject(**audio.as_dict()))
+                audio.identifier = response["data"]["CreateAudioObject"]["identifier"]
+            content_hashes.set("AudioObject", audio)
+            _written[object_key] = audio.identifier
 
     print(f"Importing audio {audio.identifier} done.\n")
 
@@ -110,7 +173,7 @@ async def import_tracks(key: str):
     # Loop the musicworks identifiers and link them to audioobjects
     #####################################
     query = mutation_merge_music_composition_recorded_as(work.identifier, recording.identifier)
-    response = await ce.connection.submit_query_async(query)
+    response = await submit_query_async(query)
     print(f"   - Linking MusicComposition {work.identifier} to MusicRecording {recording.identifier} done.")
 
     #####################################
@@ -118,7 +181,7 @@ async def import_tracks(key: str):
     # Loop the musicworks identifiers and link them to audioobjects
     #####################################
     query = mutation_merge_music_recording_audio(recording.identifier, audio.identifier)
-    response = await ce.connection.submit_query_async(query)
+    response = await submit_query_async(query)
     print(f"   - Linking MusicRecording {recording.identifier} to AudioObject {audio.identifier} done.")
 
     #####################################
@@ -128,21 +191,28 @@ async def import_tracks(key: str):
     list_person_ids = list()
     for person in persons:
 
-        person.identifier = await lookupIdentifier("Person", person.source)
+        object_key = ("Person", person.source)
+        async with _write_locks[object_key]:
+            person.identifier = _written.get(object_key, identifiers.get(object_key))
 
-        if person.identifier is not None:
-            print(f"Updating person {person.identifier} in Trompa CE\n")
+            if person.identifier is not None and content_hashes.is_unchanged("Person", person):
+                print(f"Person {person.identifier} is unchanged in Trompa CE\n")
+                list_person_ids.append(person.identifier)
+            elif person.identifier is not None:
+                print(f"Updating person {person.identifier} in Trompa CE\n")
 
-            response = await ce.connection.submit_query_async(mutation_update_person(**person.as_dict()))
-            person.identifier = response["data"]["UpdatePerson"]["identifier"]
-            list_person_ids.append(person.identifier)
-        else:
-            print("Inserting new person {} in Trompa CE\n".format(person.name))
+                response = await submit_query_async(mutation_update_person(**person.as_dict()))
+                person.identifier = response["data"]["UpdatePerson"]["identifier"]
+                list_person_ids.append(person.identifier)
+            else:
+                print("Inserting new person {} in Trompa CE\n".format(person.name))
 
-            response = await ce.connection.submit_query_async(mutation_create_person(**person.as_dict()))
+                response = await submit_query_async(mutation_create_person(**person.as_dict()))
 
-            person.identifier = response["data"]["CreatePerson"]["identifier"]
-            list_person_ids.append(person.identifier)
+                person.identifier = response["data"]["CreatePerson"]["identifier"]
+                list_person_ids.append(person.identifier)
+            content_hashes.set("Person", person)
+            _written[object_key] = person.identifier
 
     if list_person_ids:
         print(f"Importing Persons for {key} done.")
@@ -154,7 +224,7 @@ async def import_tracks(key: str):
     if not music_groups:
         for from_id, to_id in itertools.permutations(list_person_ids, 2):
             query = mutation_person_add_exact_match_person(from_id, to_id)
-            response = await ce.connection.submit_query_async(query)
+            response = await submit_query_async(query)
             print(f"   - Linking Person {from_id} to Person {to_id} done.")
 
     #####################################
@@ -163,7 +233,7 @@ async def import_tracks(key: str):
     #####################################
     for person_id in list_person_ids:
         query = mutation_merge_music_composition_composer(work.identifier, person_id)
-        response = await ce.connection.submit_query_async(query)
+        response = await submit_query_async(query)
         print(f"   - Linking Person {person_id} to MusicComposition {work.identifier} done.\n")
 
     #####################################
@@ -173,21 +243,28 @@ async def import_tracks(key: str):
     list_music_group_ids = list()
     for music_group in music_groups:
 
-        music_group.identifier = await lookupIdentifier("MusicGroup", music_group.source)
+        object_key = ("MusicGroup", music_group.source)
+        async with _write_locks[object_key]:
+            music_group.identifier = _written.get(object_key, identifiers.get(object_key))
 
-        if music_group.identifier is not None:
-            print(f"Updating music group {music_group.identifier} in Trompa CE\n")
+            if music_group.identifier is not None and content_hashes.is_unchanged("MusicGroup", music_group):
+                print(f"Music group {music_group.identifier} is unchanged in Trompa CE\n")
+                list_music_group_ids.append(music_group.identifier)
+            elif music_group.identifier is not None:
+                print(f"Updating music group {music_group.identifier} in Trompa CE\n")
 
-            response = await ce.connection.submit_query_async(mutation_update_musicgroup(**music_group.as_dict()))
-            music_group.identifier = response["data"]["UpdateMusicGroup"]["identifier"]
-            list_music_group_ids.append(music_group.identifier)
-        else:
-            print("Inserting new music group {} in Trompa CE\n".format(music_group.name))
+                response = await submit_query_async(mutation_update_musicgroup(**music_group.as_dict()))
+                music_group.identifier = response["data"]["UpdateMusicGroup"]["identifier"]
+                list_music_group_ids.append(music_group.identifier)
+            else:
+                print("Inserting new music group {} in Trompa CE\n".format(music_group.name))
 
-            response = await ce.connection.submit_query_async(mutation_create_musicgroup(**music_group.as_dict()))
+                response = await submit_query_async(mutation_create_musicgroup(**music_group.as_dict()))
 
-            music_group.identifier = response["data"]["CreateMusicGroup"]["identifier"]
-            list_music_group_ids.append(music_group.identifier)
+                music_group.identifier = response["data"]["CreateMusicGroup"]["identifier"]
+                list_music_group_ids.append(music_group.identifier)
+            content_hashes.set("MusicGroup", music_group)
+            _written[object_key] = music_group.identifier
 
     if list_music_group_ids:
         print(f"Importing Music Groups for {key} done.")
@@ -198,7 +275,7 @@ async def import_tracks(key: str):
     #####################################
     for from_id, to_id in itertools.permutations(list_music_group_ids, 2):
         query = mutation_musicgroup_add_exact_match_musicgroup(from_id, to_id)
-        response = await ce.connection.submit_query_async(query)
+        response = await submit_query_async(query)
         print(f"   - Linking Music Group {from_id} to Music Group {to_id} done.")
 
     #####################################
@@ -207,7 +284,7 @@ async def import_tracks(key: str):
     #####################################
     for music_group_id in list_music_group_ids:
         query = mutation_merge_music_composition_composer(work.identifier, music_group_id)
-        response = await ce.connection.submit_query_async(query)
+        response = await submit_query_async(query)
         print(f"   - Linking MusicGroup {music_group_id} to MusicComposition {work.identifier} done.\n")
 
     #####################################
@@ -217,10 +294,20 @@ async def import_tracks(key: str):
     for music_group_id in list_music_group_ids:
         for person_id in list_person_ids:
             query = mutation_merge_musicgroup_member(person_id, music_group_id)
-            response = await ce.connection.submit_query_async(query)
+            response = await submit_query_async(query)
             print(f"   - Linking Person {person_id} to MusicGroup {music_group_id} done.\n")
 
 
+async def lookup_identifiers(objects):
+    """
+    Look up the identifiers of a list of (dataType, object) in the CE, running the lookups at the same time.
+    Returns a dict of (dataType, source) -> identifier (or None if the object doesn't exist in the CE).
+    """
+    keys = list(dict.fromkeys((dataType, obj.source) for dataType, obj in objects))
+    results = await asyncio.gather(*[lookupIdentifier(dataType, source) for dataType, source in keys])
+    return dict(zip(keys, results))
+
+
 def get_mw_audio(key: str) -> [CE_AudioObject]:
     # Use the Muziekweb API to retrieve all the tracks on the album
     doc = get_album_information(key)
@@ -257,22 +344,36 @@ def get_mw_audio_1track(key: str) -> [CE_AudioObject]:
 
     key_album = key.split('-')[0]
 
+    tracks = get_mw_audio_tracks(key_album, [key])
+
+    if tracks is not None:
+        return tracks.get(key, ([], [], [], [], []))
+
+    return None, None, None, None, None
+
+
+def get_mw_audio_tracks(key_album: str, keys: [str]) -> dict:
+    # Use the Muziekweb API to retrieve some tracks of an album from a single album document.
+    # Returns a dict of track key -> (audio_objects, music_recordings, music_works, persons, music_groups)
+
     doc = get_album_information(key_album)
 
     if doc is not None and doc.firstChild.tagName == "Result" and doc.firstChild.attributes['ErrorCode'].value == "0":
 
-        # Now extract the audio links from the Muziekweb data
-        audio_objects = list()
-        music_recordings = list()
-        music_works = list()
-        persons = list()
-        music_groups = list()
+        tracks = dict()
 
         for track in doc.getElementsByTagName('Track'):
 
             trackId = track.getElementsByTagName('AlbumTrackID')[0].firstChild.data
 
-            if trackId == key:
+            if trackId in keys:
+                # Now extract the audio links from the Muziekweb data
+                audio_objects = list()
+                music_recordings = list()
+                music_works = list()
+                persons = list()
+                music_groups = list()
+
                 track_name = track.getElementsByTagName('TrackTitle')[0].firstChild.data
                 # append audio object
                 audio_object = CE_AudioObject(
@@ -323,30 +424,44 @@ def get_mw_audio_1track(key: str) -> [CE_AudioObject]:
                 music_works.append(music_work)
                 # append persons
                 perf_link = track.getElementsByTagName('Performer')[0].attributes['Link'].value
-                doc_artist = get_artist_information(perf_link)
-                num_ext_links = int(doc_artist.getElementsByTagName('ExternalLinks')[0].attributes['Count'].value)
-                perf_name = doc_artist.getElementsByTagName('PresentationName')[0].firstChild.data
+                performer = get_performer_information(perf_link)
+                perf_name = performer["name"]
                 perf_text = perf_name.replace(' ', '-')
                 # check if person or musicgroup
-                prov_names = [doc_artist.getElementsByTagName('ExternalLink')[pers].attributes['Provider'].value for pers in range(num_ext_links)]
-                artist_type = None
-                if 'MUSICBRAINZ' in prov_names:
-                    ext_link = doc_artist.getElementsByTagName('ExternalLinks')[0].getElementsByTagName('Link')[prov_names.index('MUSICBRAINZ')].firstChild.data
-                    mbid = ext_link.split('/')[-1]
-                    artist = musicbrainz.get_artist_from_musicbrainz(mbid)
-                    artist_type = artist.get('type', None)
+                artist_type = performer_cache.get_or_load(f"type:{perf_link}", get_artist_type, performer["links"])
 
                 if artist_type == 'Group':
-                    music_groups, persons = get_music_group_information(doc_artist, music_groups, persons, num_ext_links, perf_name, perf_link, perf_text, unif_style)
+                    music_groups, persons = get_music_group_information(performer["links"], music_groups, persons, perf_name, perf_link, perf_text, unif_style)
                 else:
-                    persons = get_person_information(doc_artist, persons, num_ext_links, perf_name, perf_link, perf_text, unif_style)
+                    persons = get_person_information(performer["links"], persons, perf_name, perf_link, perf_text, unif_style)
 
-        return audio_objects, music_recordings, music_works, persons, music_groups
+                tracks[trackId] = (audio_objects, music_recordings, music_works, persons, music_groups)
 
-    return None, None, None, None, None
+        return tracks
 
+    return None
 
-def get_person_information(doc_artist, persons, num_ext_links, perf_name, perf_link, perf_text, unif_style):
+
+def get_artist_type(links):
+    """
+    The MusicBrainz artist type (e.g. Person or Group) of a performer with these external links, if it has a MusicBrainz link.
+    """
+    for prov_name, ext_link in links:
+        if prov_name == 'MUSICBRAINZ':
+            mbid = ext_link.split('/')[-1]
+            artist = musicbrainz.get_artist_from_musicbrainz(mbid)
+            return artist.get('type', None)
+    return None
+
+
+def load_external(loader, *args):
+    """
+    Call one of the functions that loads a person from an external site, using the performer cache.
+    """
+    return performer_cache.get_or_load(f"{loader.__name__}:{'|'.join(args)}", loader, *args)
+
+
+def get_person_information(links, persons, perf_name, perf_link, perf_text, unif_style):
     """
     """
     # MW person
@@ -362,15 +477,11 @@ def get_person_information(doc_artist, persons, num_ext_links, perf_name, perf_l
     persons.append(person)
 
     # external links
-    for pers in range(num_ext_links):
-
-        prov_name = doc_artist.getElementsByTagName('ExternalLink')[pers].attributes['Provider'].value
+    for prov_name, ext_link in links:
         print('Searching for person: {} - {}'.format(perf_name, prov_name))
-        ext_link = doc_artist.getElementsByTagName('ExternalLinks')[0].getElementsByTagName('Link')[
-            pers].firstChild.data
         if prov_name == 'ISNI':
             ext_link = MW_MUSIC_URL.format(perf_link, unif_style, ext_link)
-            ppl = load_person_from_isni(ext_link)
+            ppl = load_external(load_person_from_isni, ext_link)
             person = CE_Person(
                 identifier=None,
                 name=ppl['title'],
@@ -381,7 +492,7 @@ def get_person_information(doc_artist, persons, num_ext_links, perf_name, perf_l
                 source=ppl['source'],
             )
         elif prov_name == 'VIAF':
-            ppl = load_person_from_viaf(ext_link)
+            ppl = load_external(load_person_from_viaf, ext_link)
             person = CE_Person(
                 identifier=None,
                 name=ppl['title'],
@@ -393,7 +504,7 @@ def get_person_information(doc_artist, persons, num_ext_links, perf_name, perf_l
             )
         elif prov_name == 'MUSICBRAINZ':
             mbid = ext_link.split('/')[-1]
-            ppls = musicbrainz.load_artist_from_musicbrainz(mbid)
+            ppls = load_external(musicbrainz.load_artist_from_musicbrainz, mbid)
             for ppl in ppls:
                 person = CE_Person(
                     identifier=None,
@@ -411,7 +522,7 @@ def get_person_information(doc_artist, persons, num_ext_links, perf_name, perf_l
                 persons.append(person)
 
         elif prov_name == 'WIKIDATA':
-            ppl = load_person_from_wikidata_url(ext_link)
+            ppl = load_external(load_person_from_wikidata_url, ext_link)
             person = CE_Person(
                 identifier=None,
                 name=ppl['title'],
@@ -424,7 +535,7 @@ def get_person_information(doc_artist, persons, num_ext_links, perf_name, perf_l
             person.description = ppl['description']
         elif prov_name == 'WIKIPEDIA_EN':
             en_wiki_link = 'https://en.wikipedia.org/wiki/{}'.format(ext_link)
-            ppl = load_person_from_wikipedia_url(en_wiki_link, 'en')
+            ppl = load_external(load_person_from_wikipedia_url, en_wiki_link, 'en')
             if ppl:
                 person = CE_Person(
                     identifier=None,
@@ -439,7 +550,7 @@ def get_person_information(doc_artist, persons, num_ext_links, perf_name, perf_l
 
         elif prov_name == 'WIKIPEDIA_NL':
             nl_wiki_link = 'https://nl.wikipedia.org/wiki/{}'.format(ext_link)
-            ppl = load_person_from_wikipedia_url(nl_wiki_link, 'nl')
+            ppl = load_external(load_person_from_wikipedia_url, nl_wiki_link, 'nl')
             if ppl:
                 person = CE_Person(
                     identifier=None,
@@ -475,7 +586,7 @@ def get_person_information(doc_artist, persons, num_ext_links, perf_name, perf_l
     return persons
 
 
-def get_music_group_information(doc_artist, music_groups, persons, num_ext_links, perf_name, perf_link, perf_text, unif_style):
+def get_music_group_information(links, music_groups, persons, perf_name, perf_link, perf_text, unif_style):
     """
     """
     # MW Music Group
@@ -491,14 +602,11 @@ def get_music_group_information(doc_artist, music_groups, persons, num_ext_links
     music_groups.append(music_group)
 
     # external links
-    for pers in range(num_ext_links):
-        prov_name = doc_artist.getElementsByTagName('ExternalLink')[pers].attributes['Provider'].value
+    for prov_name, ext_link in links:
         print('Searching for music group: {} - {}'.format(perf_name, prov_name))
-        ext_link = doc_artist.getElementsByTagName('ExternalLinks')[0].getElementsByTagName('Link')[
-            pers].firstChild.data
         if prov_name == 'ISNI':
             ext_link = MW_MUSIC_URL.format(perf_link, unif_style, ext_link)
-            ppl = load_person_from_isni(ext_link)
+            ppl = load_external(load_person_from_isni, ext_link)
             music_group = CE_MusicGroup(
                 identifier=None,
                 name=ppl['title'],
@@ -509,7 +617,7 @@ def get_music_group_information(doc_artist, music_groups, persons, num_ext_links
                 source=ppl['source'],
             )
         elif prov_name == 'VIAF':
-            ppl = load_person_from_viaf(ext_link)
+            ppl = load_external(load_person_from_viaf, ext_link)
             music_group = CE_MusicGroup(
                 identifier=None,
                 name=ppl['title'],
@@ -522,7 +630,7 @@ def get_music_group_information(doc_artist, music_groups, persons, num_ext_links
         elif prov_name == 'MUSICBRAINZ':
             mbid = ext_link.split('/')[-1]
 
-            ppls = musicbrainz.load_artist_from_musicbrainz(mbid)
+            ppls = load_external(musicbrainz.load_artist_from_musicbrainz, mbid)
             ppl = ppls[0]
             music_group = CE_MusicGroup(
                 identifier=None,
@@ -551,7 +659,7 @@ def get_music_group_information(doc_artist, music_groups, persons, num_ext_links
                 persons.append(person)
 
         elif prov_name == 'WIKIDATA':
-            ppl = load_person_from_wikidata_url(ext_link)
+            ppl = load_external(load_person_from_wikidata_url, ext_link)
             music_group = CE_MusicGroup(
                 identifier=None,
                 name=ppl['title'],
@@ -564,7 +672,7 @@ def get_music_group_information(doc_artist, music_groups, persons, num_ext_links
             music_group.description = ppl['description']
         elif prov_name == 'WIKIPEDIA_EN':
             en_wiki_link = 'https://en.wikipedia.org/wiki/{}'.format(ext_link)
-            ppl = load_person_from_wikipedia_url(en_wiki_link, 'en')
+            ppl = load_external(load_person_from_wikipedia_url, en_wiki_link, 'en')
             if ppl:
                 music_group = CE_MusicGroup(
                     identifier=None,
@@ -579,7 +687,7 @@ def get_music_group_information(doc_artist, music_groups, persons, num_ext_links
 
         elif prov_name == 'WIKIPEDIA_NL':
             nl_wiki_link = 'https://nl.wikipedia.org/wiki/{}'.format(ext_link)
-            ppl = load_person_from_wikipedia_url(nl_wiki_link, 'nl')
+            ppl = load_external(load_person_from_wikipedia_url, nl_wiki_link, 'nl')
             if ppl:
                 music_group = CE_MusicGroup(
                     identifier=None,
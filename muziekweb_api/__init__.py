@@ -1,9 +1,13 @@
 """
 Basic use of the Muziekweb REST API.
 """
+import threading
+import time
 import urllib.request
 from xml.dom import minidom
 
+from ceimport.cache import JsonFileCache, LRUCache, SingleFlight
+
 """
 Constants for Muziekweb API
 """
@@ -11,6 +15,22 @@ MW_API_HOST = "http://api.cdr.nl:8080"
 
 _api_activated = False
 
+# Number of album documents to keep. Tracks of an album are usually imported one after the other,
+# so only the most recently used albums are kept
+ALBUM_CACHE_SIZE = 256
+# Number of artist documents to keep. Artists appear on tracks of many albums, so more of them are kept
+ARTIST_CACHE_SIZE = 1024
+
+
+# Number of seconds that items in the performer cache are used for
+PERFORMER_CACHE_TTL = 30 * 24 * 60 * 60
+
+# Documents loaded from the API, shared by all tracks in an import, by album and performer key
+_albums = LRUCache(ALBUM_CACHE_SIZE)
+_artists = LRUCache(ARTIST_CACHE_SIZE)
+_cache_lock = threading.Lock()
+_in_flight = SingleFlight()
+
 
 def set_api_account(user, password):
     global _api_activated
@@ -24,7 +44,7 @@ def set_api_account(user, password):
     _api_activated = True
 
 
-def get_album_information(key: str):
+def _load_album_information(key: str):
     # global _api_activated
 
     if _api_activated:
@@ -54,7 +74,7 @@ def get_track_information(key: str):
     return None
 
 
-def get_artist_information(key: str):
+def _load_artist_information(key: str):
     # global _api_activated
 
     if _api_activated:
@@ -67,3 +87,102 @@ def get_artist_information(key: str):
             return minidom.parseString(body)
 
     return None
+
+
+class PerformerCache(JsonFileCache):
+    """
+    Information about performers that was loaded from Muziekweb and other sites, kept in a json file
+    between imports. Performers appear on many tracks, and this information rarely changes, so each
+    performer only needs to be loaded once. Items expire `ttl` seconds after they were loaded.
+    """
+
+    def __init__(self, ttl=PERFORMER_CACHE_TTL):
+        super().__init__()
+        self.ttl = ttl
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            item = self._items.get(key)
+        if item is None or time.time() - item["time"] > self.ttl:
+            return default
+        return item["value"]
+
+    def set(self, key: str, value):
+        """
+        Store `value` for `key`. Empty values (e.g. from a failed lookup) aren't stored, so that they are
+        loaded again next time instead of hiding the performer until the item expires.
+        """
+        if value:
+            with self._lock:
+                self._items[key] = {"time": time.time(), "value": value}
+
+    def get_or_load(self, key: str, load, *args):
+        """
+        Return the item `key`. If it isn't in the cache or it expired, call `load(*args)` to get it.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        def load_and_store(key):
+            value = self.get(key, missing)
+            if value is missing:
+                value = load(*args)
+                self.set(key, value)
+            return value
+
+        return _in_flight.do(("performer-cache", key), load_and_store, key)
+
+
+def _shared(cache, name, key, load):
+    """
+    Load a document once, even when many threads ask for it at the same time.
+    """
+    with _cache_lock:
+        if key in cache:
+            return cache[key]
+
+    def load_and_store(key):
+        with _cache_lock:
+            if key in cache:
+                return cache[key]
+        doc = load(key)
+        if doc is not None:
+            with _cache_lock:
+                cache[key] = doc
+        return doc
+
+    return _in_flight.do((name, key), load_and_store, key)
+
+
+def get_album_information(key: str):
+    return _shared(_albums, "album", key, _load_album_information)
+
+
+def get_artist_information(key: str):
+    return _shared(_artists, "artist", key, _load_artist_information)
+
+
+def _load_performer_information(key: str):
+    doc_artist = get_artist_information(key)
+    if doc_artist is None:
+        return None
+
+    num_ext_links = int(doc_artist.getElementsByTagName('ExternalLinks')[0].attributes['Count'].value)
+    providers = doc_artist.getElementsByTagName('ExternalLink')
+    links = doc_artist.getElementsByTagName('ExternalLinks')[0].getElementsByTagName('Link')
+    return {
+        "name": doc_artist.getElementsByTagName('PresentationName')[0].firstChild.data,
+        "links": [[providers[i].attributes['Provider'].value, links[i].firstChild.data] for i in range(num_ext_links)],
+    }
+
+
+def get_performer_information(key: str):
+    """
+    The name and a list of [provider, link] external links of a performer, from the performer cache if it's there.
+    """
+    return performer_cache.get_or_load(f"performer:{key}", _load_performer_information, key)
+
+
+performer_cache = PerformerCache()
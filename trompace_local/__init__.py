@@ -1,8 +1,14 @@
 """
 Local functions to select data from the Trompa CE.
 """
-import trompace as ce
-from trompace.connection import submit_query
+import hashlib
+import json
+
+import aiohttp
+from trompace.config import config
+from trompace.exceptions import QueryException
+
+from ceimport.cache import JsonFileCache
 
 """
 Constants for registry in Trompa
@@ -12,6 +18,53 @@ GLOBAL_PUBLISHER = "https://www.muziekweb.nl"  # CE Publisher id????
 GLOBAL_IMPORTER_REPO = "https://github.com/trompamusic/ce-data-import"
 
 
+_session = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    The aiohttp session shared by all queries to the CE. It's created the first time
+    that it's used, and must be used in the event loop that was running at that moment.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession()
+    return _session
+
+
+async def close_session():
+    """
+    Close the shared session. Call this before the event loop that it was used in ends.
+    """
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def submit_query_async(querystr: str, auth_required=False):
+    """
+    Submit a query to the CE without blocking the event loop.
+    The same as trompace.connection.submit_query_async, which blocks while the query is sent.
+    """
+    q = {"query": querystr}
+    headers = {}
+    if auth_required and config.server_auth_required:
+        token = config.jwt_token
+        headers["Authorization"] = f"Bearer {token}"
+    async with get_session().post(config.host, json=q, headers=headers) as r:
+        if r.status >= 400:
+            print("error")
+            print(await r.read())
+        try:
+            resp = await r.json(content_type=None)
+        except ValueError:
+            raise QueryException([{"message": await r.read()}])
+    if "errors" in resp.keys():
+        raise QueryException(resp['errors'])
+    return resp
+
+
 async def queryFor(dataType, field, value):
     """
     Queries CE for objects by type and identifying field value.
@@ -28,8 +81,7 @@ async def queryFor(dataType, field, value):
     }}
     """
 
-    resultset = ce.connection.submit_query(search_query)
-    # resultset = await ce.connection.submit_query_async(search_query)
+    resultset = await submit_query_async(search_query)
 
     return resultset["data"][dataType]
 
@@ -45,3 +97,36 @@ async def lookupIdentifier(dataType, source):
         return objects[0]["identifier"]
 
     return None
+
+
+def content_hash(model):
+    """
+    Hash of the content of a model that is sent to the CE (without its identifier).
+    """
+    content = {k: v for k, v in model.as_dict().items() if k != "identifier"}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ContentHashes(JsonFileCache):
+    """
+    The identifier and content hash of each object written to the CE, by type and source.
+    If the hash of an object is the same as the one stored for it, the object in the CE
+    is already up to date and doesn't need to be updated.
+    """
+
+    def is_unchanged(self, dataType, model):
+        """
+        True if `model` was written to the CE with the same identifier and content before.
+        """
+        with self._lock:
+            item = self._items.get(dataType, {}).get(model.source)
+        return item is not None and item["identifier"] == model.identifier and item["hash"] == content_hash(model)
+
+    def set(self, dataType, model):
+        if model.source and model.identifier:
+            item = {"identifier": model.identifier, "hash": content_hash(model)}
+            with self._lock:
+                self._items.setdefault(dataType, {})[model.source] = item
+
+
+content_hashes = ContentHashes()